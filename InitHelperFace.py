@@ -22,21 +22,42 @@
 # *                                                                         *
 # ***************************************************************************
 
-import FreeCADGui
+import time
+startTime = time.perf_counter()
+
+import FreeCAD, FreeCADGui
 from PySide import QtGui
-import PathHelperFaceGui, PathHelperFace
 import os
 
 __dir__ = os.path.dirname(__file__)
 iconPath = os.path.join( __dir__, 'Icons' )
 
+## startup cost of the addon in milliseconds, reported to the report view log
+startupTimes = {}
+
 def getIcon(iconName):
      return os.path.join( iconPath , iconName)
 
+def reportTime(stage, stageStart):
+    """Record and log the time taken by a startup stage."""
+    startupTimes[stage] = (time.perf_counter() - stageStart) * 1000
+    FreeCAD.Console.PrintLog('PathHelperFace startup: {} {:.2f} ms\n'.format(stage, startupTimes[stage]))
+
+def showPanel():
+    """Import the panel on first use so the addon costs nothing until it is needed."""
+    import PathHelperFaceGui
+    PathHelperFaceGui.Show()
+
+def createJobFaces():
+    """Import the panel module on first use and create the helper faces of the selected job."""
+    import PathHelperFaceGui
+    PathHelperFaceGui.createJobFaces()
+
 def updateMenu(workbench):
 
     if workbench == 'PathWorkbench':
     
+        menuStart = time.perf_counter()
         print('Path Helperface loaded:', workbench)
         
         mw = FreeCADGui.getMainWindow()
@@ -65,9 +86,19 @@ def updateMenu(workbench):
         action.setText("Helper Face")
         action.setIcon(QtGui.QPixmap(getIcon('Path_HelperFace.svg')))
         action.setStatusTip("Create a helper face")
-        action.triggered.connect(PathHelperFaceGui.Show)
+        action.triggered.connect(showPanel)
 
         # append this addon to addon menu
         addonMenu.addAction(action)
 
+        # create an action to generate the helper faces of a whole job
+        jobAction = QtGui.QAction(addonMenu)
+        jobAction.setText("Helper Faces For Job")
+        jobAction.setIcon(QtGui.QPixmap(getIcon('Path_HelperFace.svg')))
+        jobAction.setStatusTip("Create helper faces for all the open horizontal faces of the selected job")
+        jobAction.triggered.connect(createJobFaces)
+        addonMenu.addAction(jobAction)
+        reportTime('menu', menuStart)
+
 FreeCADGui.getMainWindow().workbenchActivated.connect(updateMenu)
+reportTime('import', startTime)
@@ -22,79 +22,159 @@
 # *                                                                         *
 # ***************************************************************************
 
-import FreeCAD, FreeCADGui
+import FreeCAD
 import Part
-import os, math
-from PySide.QtGui import QMessageBox
+import os, json, time, tempfile, hashlib
+import collections
+import cProfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 import PathScripts.PathUtils as PathUtils
 
-import PathHelperFaceGui
+from PathHelperFaceCore import HelperEdgeManager, insideCache, computeBoundaries, profiler, getProfileMode, boundarySignature
+from PathHelperFaceCore import faceSignature, resolveFace, getOpenFaces, groupAdjacentFaces, isLevelFace
+
+if FreeCAD.GuiUp:
+	import FreeCADGui
+	from PySide.QtGui import QMessageBox
 
 __dir__ = os.path.dirname(__file__)
 iconPath = os.path.join( __dir__, 'Icons' )
 
-class HelperEdge:
-	def __init__(self, edge, obj, fixedEdge = False):
-
-		self._edge = edge
-		self._obj = obj
-		self._extendable = False
-		self._fixedEdge = fixedEdge
-
-	def _getEdge(self):
-		return self._edge
-
-	def _getMidParam(self):
-		midparam = self._edge.FirstParameter + 0.5 * (self._edge.LastParameter - self._edge.FirstParameter)
-		return midparam
-	
-	def _getMidPnt(self):
-		''' get the mid point '''
-		midpnt = self._edge.valueAt(self._getMidParam())
-		return midpnt
-
-	def _rotate(self, vec, angle):
-		''' rotate point by angle in radians '''
-		x = vec.x * math.cos(angle) - vec.y * math.sin(angle)
-		y = vec.x * math.sin(angle) + vec.y * math.cos(angle)
-		return FreeCAD.Vector(x, y, vec.z)
-
-	def _getPerpNormal(self):
-		''' get edge perpendicular normal at the mid point in the open direction'''
-		midpnt = self._getMidPnt()
-		axialNorm = self._edge.tangentAt(self._getMidParam())
-		perpNormal = self._rotate(axialNorm, 1.5708)
-
-		poffPlus = midpnt + 0.01 * perpNormal
-		poffMinus = midpnt - 0.01 * perpNormal
-
-		if self._obj.Shape.isInside(poffPlus, 0.005, False):
-			perpNormal = perpNormal.negative()
-		if self._obj.Shape.isInside(poffMinus, 0.005, False):
-			pass
-
-		return perpNormal
-
-	def _isExtendable(self):
-		''' check if the edge is extendable i.e. constrained by a connected face'''
-		if self._fixedEdge:
-			return False
-
-		extendable = True
-		midpnt = self._getMidPnt()
-		perpNormal = self._getPerpNormal()
-
-		poffPlus = midpnt + 0.01 * perpNormal
-		poffMinus = midpnt - 0.01 * perpNormal
-
-		if self._obj.Shape.isInside(poffPlus, 0.005, False):
-			extendable =  False
-		if self._obj.Shape.isInside(poffMinus, 0.005, False):
-			extendable = False
-
-		return extendable
+class JobContext:
+	''' per document cache of the job data used by the helper faces, kept up to date by JobContextObserver '''
+	def __init__(self, doc):
+		self.doc = doc
+		self.clear()
+
+	def clear(self):
+		self._jobs = {}
+		self._stocks = {}
+		self._stockOwners = {}
+		self._toolControllers = {}
+		self._helperGroups = {}
+		self._helperFaces = {}
+		self._helperGroupOwners = {}
+
+	def getJob(self, model):
+		''' return the parent job of the model '''
+		if model.Name not in self._jobs:
+			self._jobs[model.Name] = PathUtils.findParentJob(model)
+		return self._jobs[model.Name]
+
+	def getStock(self, job):
+		''' return the stock shape of the job '''
+		if job.Name not in self._stocks:
+			self._stocks[job.Name] = job.Stock.Shape
+			self._stockOwners[job.Stock.Name] = job.Name
+		return self._stocks[job.Name]
+
+	def getToolControllers(self, job):
+		''' return the list of tool controllers of the job '''
+		if job.Name not in self._toolControllers:
+			self._toolControllers[job.Name] = list(job.Tools.Group)
+		return self._toolControllers[job.Name]
+
+	def getHelperGroup(self, job):
+		''' return the helper geometry group of the job, creating it when it does not exist '''
+		helperGrp = self._helperGroups.get(job.Name)
+		if helperGrp is None:
+			helperGrpName = job.Name + '_HelperGeometry'
+			helperGrp = self.doc.getObject(helperGrpName)
+			if not helperGrp:
+				helperGrp = self.doc.addObject("App::DocumentObjectGroup", helperGrpName)
+			self._helperGroups[job.Name] = helperGrp
+		return helperGrp
+
+	def getHelperFaces(self, job):
+		''' return the helper faces in the helper geometry group of the job '''
+		if job.Name not in self._helperFaces:
+			helperGrpName = job.Name + '_HelperGeometry'
+			helperGrp = self.doc.getObject(helperGrpName)
+			helperFaces = []
+			if helperGrp:
+				helperFaces = [obj for obj in helperGrp.Group if isinstance(getattr(obj, 'Proxy', None), HelperFace)]
+			self._helperFaces[job.Name] = helperFaces
+			self._helperGroupOwners[helperGrpName] = job.Name
+		return self._helperFaces[job.Name]
+
+	def isHelperObject(self, obj):
+		''' check if the object is a helper group or helper face, changes to these never affect the cached job data '''
+		return obj in self._helperGroups.values() or isinstance(getattr(obj, 'Proxy', None), HelperFace)
+
+	def onChangedObject(self, obj, prop):
+		''' drop the cached data the property change may affect '''
+		if prop == 'Group' and obj.Name in self._helperGroupOwners:
+			## a helper face was added to or removed from a job
+			self._helperFaces.pop(self._helperGroupOwners.pop(obj.Name), None)
+		if self.isHelperObject(obj):
+			return
 
+		if prop in ('Group', 'Model', 'Stock', 'Tools'):
+			## job membership or tool lists changed
+			self._jobs = {}
+			self._toolControllers = {}
+			if prop == 'Stock':
+				## the job has a new stock object
+				self._stocks.pop(obj.Name, None)
+				for stockName in [stockName for stockName, jobName in self._stockOwners.items() if jobName == obj.Name]:
+					self._stockOwners.pop(stockName)
+		elif prop == 'Shape' and obj.Name in self._stockOwners:
+			self._stocks.pop(self._stockOwners.pop(obj.Name), None)
+		elif prop in ('Label', 'Tool'):
+			for jobName, toolControllers in list(self._toolControllers.items()):
+				if obj in toolControllers:
+					self._toolControllers.pop(jobName)
+
+## job contexts by document name
+jobContexts = {}
+
+def getJobContext(doc):
+	''' return the job context of the document '''
+	context = jobContexts.get(doc.Name)
+	if context is None or context.doc != doc:
+		context = JobContext(doc)
+		jobContexts[doc.Name] = context
+	return context
+
+class JobContextObserver:
+	''' document observer that keeps the job contexts in step with the documents '''
+	def slotChangedObject(self, obj, prop):
+		context = jobContexts.get(obj.Document.Name)
+		if context is not None:
+			context.onChangedObject(obj, prop)
+
+	def slotDeletedObject(self, obj):
+		context = jobContexts.get(obj.Document.Name)
+		if context is not None and not isinstance(getattr(obj, 'Proxy', None), HelperFace):
+			context.clear()
+
+	def slotDeletedDocument(self, doc):
+		jobContexts.pop(doc.Name, None)
+
+class HelperFaceObserver:
+	''' document observer that relinks the tool controllers and the stock of the helper faces when their job changes '''
+	def slotChangedObject(self, obj, prop):
+		if prop == 'Stock' and hasattr(obj, 'Tools'):
+			## the job has a new stock object
+			for helper in getJobContext(obj.Document).getHelperFaces(obj):
+				if hasattr(helper, 'Stock'):
+					helper.Proxy.linkStock(helper)
+		elif prop == 'Group':
+			for job in obj.InList:
+				if getattr(job, 'Tools', None) != obj:
+					continue
+				## a tool controller was added to or removed from the job
+				for helper in getJobContext(obj.Document).getHelperFaces(job):
+					if hasattr(helper, 'ToolControllers') and helper.AllTools:
+						helper.Proxy.linkToolControllers(helper)
+
+if 'jobContextObserver' not in globals():
+	jobContextObserver = JobContextObserver()
+	FreeCAD.addDocumentObserver(jobContextObserver)
+	helperFaceObserver = HelperFaceObserver()
+	FreeCAD.addDocumentObserver(helperFaceObserver)
 
 class HelperFace:
 	def __init__(self, obj, baseFace, toolController=None):
@@ -107,47 +187,372 @@ class HelperFace:
 		if toolController:
 			obj.ToolController = toolController
 		obj.Proxy = self
+		self._boundary = None
+		self._storedBoundary = None
+		self._inputKey = None
+		self._extendedFaces = {}
+		self._facesKey = None
 
 		obj.setEditorMode('CheckedEdges', 2)
 		obj.setEditorMode('ExtendableEdges', 2)
+		self.addProperties(obj)
+		self.storeFaceSignatures(obj)
+
+	def addProperties(self, obj):
+		''' add the properties missing from helper faces created by older versions '''
+		if not hasattr(obj, 'ProfileStats'):
+			obj.addProperty('App::PropertyString', 'ProfileStats', 'Profile', 'stage timings and call counts of the last profiled recompute')
+			obj.setEditorMode('ProfileStats', 1)
+		if not hasattr(obj, 'BaseFaceSignature'):
+			obj.addProperty('App::PropertyString', 'BaseFaceSignature', 'Base', 'fingerprint of the base faces used to find them again when the model faces are renumbered')
+			obj.setEditorMode('BaseFaceSignature', 2)
+		if not hasattr(obj, 'BoundaryShape'):
+			obj.addProperty('App::PropertyPartShape', 'BoundaryShape', 'Base', 'boundary edges saved with the document so it reopens without rediscovering them')
+			obj.setEditorMode('BoundaryShape', 2)
+		if not hasattr(obj, 'BoundaryCache'):
+			obj.addProperty('App::PropertyString', 'BoundaryCache', 'Base', 'input key and extendable edges of the saved boundary edges')
+			obj.setEditorMode('BoundaryCache', 2)
+		if not hasattr(obj, 'AllTools'):
+			obj.addProperty('App::PropertyBool', 'AllTools', 'Tools', 'also generate the face extended for every tool controller of the job')
+		if not hasattr(obj, 'ToolFaces'):
+			obj.addProperty('App::PropertyPartShape', 'ToolFaces', 'Tools', 'faces extended for each tool controller, in the order of ToolFaceLabels')
+			obj.setEditorMode('ToolFaces', 2)
+		if not hasattr(obj, 'ToolFaceLabels'):
+			obj.addProperty('App::PropertyStringList', 'ToolFaceLabels', 'Tools', 'labels of the tool controllers of the faces in ToolFaces')
+			obj.setEditorMode('ToolFaceLabels', 1)
+		if not hasattr(obj, 'ToolControllers'):
+			obj.addProperty('App::PropertyLinkList', 'ToolControllers', 'Tools', 'tool controllers of the job, linked so tool changes recompute the tool faces')
+			obj.setEditorMode('ToolControllers', 2)
+			self.linkToolControllers(obj)
+		if not hasattr(obj, 'Stock'):
+			obj.addProperty('App::PropertyLink', 'Stock', 'Base', 'stock of the job, linked so stock changes recompute the helper face')
+			obj.setEditorMode('Stock', 2)
+			self.linkStock(obj)
+		if not hasattr(obj, 'EdgeDistances'):
+			obj.addProperty('App::PropertyFloatList', 'EdgeDistances', 'Base', 'additional offset of each extendable edge, in the order of ExtendableEdges')
+			obj.setEditorMode('EdgeDistances', 2)
+
+	def getFaceSignatures(self, obj):
+		''' return the stored base face fingerprints '''
+		def toTuple(value):
+			if isinstance(value, list):
+				return tuple(toTuple(v) for v in value)
+			return value
+
+		if not obj.BaseFaceSignature:
+			return []
+		return [toTuple(signature) for signature in json.loads(obj.BaseFaceSignature)]
+
+	def storeFaceSignatures(self, obj):
+		''' store the fingerprints of the current base faces '''
+		model, faceNames = obj.BaseFace
+		signatures = json.dumps([faceSignature(model.Shape.getElement(faceName)) for faceName in faceNames])
+		if obj.BaseFaceSignature != signatures:
+			obj.BaseFaceSignature = signatures
+
+	def resolveBaseFace(self, obj):
+		''' find the base faces again when a model edit renumbered them, one index lookup per face.
+			returns False when a base face is no longer in the model '''
+		model, faceNames = obj.BaseFace
+		signatures = self.getFaceSignatures(obj)
+		if len(signatures) == len(faceNames):
+			resolved = []
+			missing = []
+			for faceName, signature in zip(faceNames, signatures):
+				resolvedName = resolveFace(model.Shape, faceName, signature)
+				if resolvedName is None:
+					missing.append(faceName)
+				resolved.append(resolvedName or faceName)
+
+			if missing:
+				## keep the stored fingerprints so the face is found again if it comes back
+				FreeCAD.Console.PrintError('Helper face {} base face {} not found in {}, select the face again\n'.format(obj.Name, ', '.join(missing), model.Label))
+				return False
+
+			if resolved != list(faceNames):
+				FreeCAD.Console.PrintMessage('Helper face {} base face moved from {} to {}\n'.format(obj.Name, ', '.join(faceNames), ', '.join(resolved)))
+				obj.BaseFace = (model, resolved)
+
+		self.storeFaceSignatures(obj)
+		return True
+
+	def __getstate__(self):
+		return None
+
+	def __setstate__(self, state):
+		self._boundary = None
+		self._storedBoundary = None
+		self._inputKey = None
+		self._extendedFaces = {}
+		self._facesKey = None
+		return None
 
 	def onChanged(self, obj, prop):
 		'''Do something when a property has changed'''
 		#FreeCAD.Console.PrintMessage("Change property: " + str(prop) + "\n")
-		pass
+		if prop == 'BaseFace' and hasattr(obj, 'BaseFaceSignature') and 'Restore' not in obj.State:
+			## a new base face was picked, track it from now on
+			self.storeFaceSignatures(obj)
+		if prop == 'AllTools' and hasattr(obj, 'ToolControllers') and 'Restore' not in obj.State:
+			self.linkToolControllers(obj)
+
+	def linkToolControllers(self, obj):
+		''' link the tool controllers of the job while AllTools is set '''
+		toolControllers = []
+		if obj.AllTools:
+			job = getJobContext(obj.Document).getJob(obj.BaseFace[0])
+			if job is not None:
+				toolControllers = list(job.Tools.Group)
+		if obj.ToolControllers != toolControllers:
+			obj.ToolControllers = toolControllers
+
+	def linkStock(self, obj):
+		''' link the stock of the job '''
+		job = getJobContext(obj.Document).getJob(obj.BaseFace[0])
+		stock = job.Stock if job is not None else None
+		if obj.Stock != stock:
+			obj.Stock = stock
 
 	def onDocumentRestored(self, obj):
 		'''Do something when a document is restored'''
-		pass
+		self.addProperties(obj)
+		self.loadBoundary(obj)
+		if FreeCAD.GuiUp and obj.ViewObject is not None and getattr(obj.ViewObject, 'Proxy', None) is None:
+			## helper faces created headless have no view provider
+			ViewProviderHelperFace(obj.ViewObject)
+
+	def getStoredKey(self, obj, boundaryKey):
+		''' return a hash of the boundary inputs that is stable between sessions, the stock shape hash is replaced by its volume '''
+		faceSignatures, modelTop, stockHash, stockBounds, faceNames = boundaryKey
+		model = obj.BaseFace[0]
+		context = getJobContext(model.Document)
+		stockShape = context.getStock(context.getJob(model))
+		inputs = json.dumps([faceSignatures, modelTop, stockBounds, round(stockShape.Volume, 6), faceNames])
+		return hashlib.sha1(inputs.encode('utf-8')).hexdigest()
+
+	def storeBoundary(self, obj, boundaryKey, edges, extendableEdges):
+		''' save the boundary edges and their classification in the document '''
+		obj.BoundaryShape = Part.Compound(edges)
+		obj.BoundaryCache = json.dumps({'key': self.getStoredKey(obj, boundaryKey), 'extendableEdges': extendableEdges})
+
+	def loadBoundary(self, obj):
+		''' read the boundary saved in the document, it is used once its key matches the current inputs '''
+		self._storedBoundary = None
+		if not obj.BoundaryCache or obj.BoundaryShape.isNull():
+			return
 
-	def execute(self, obj):
-		""" Called on document recompute """
-		edgeManager = HelperEdgeManager() 
-		helperEdges = edgeManager.getEdges(obj.BaseFace)
+		stored = json.loads(obj.BoundaryCache)
+		self._storedBoundary = (stored['key'], obj.BoundaryShape.Edges, stored['extendableEdges'])
+
+	def getBoundaryKey(self, obj):
+		''' return the inputs that the discovered boundary depends on '''
+		model = obj.BaseFace[0]
+		context = getJobContext(model.Document)
+		job = context.getJob(model)
+		stockShape = context.getStock(job)
+		bb = stockShape.BoundBox
+		stockBounds = (bb.XMin, bb.YMin, bb.ZMin, bb.XMax, bb.YMax, bb.ZMax)
+
+		## the top of the model decides when the stock top is used for the top faces
+		modelTop = round(model.Shape.BoundBox.ZMax, 6)
+		faceSignatures = tuple(boundarySignature(model.Shape, faceName) for faceName in obj.BaseFace[1])
+		return (faceSignatures, modelTop, stockShape.hashCode(), stockBounds, tuple(obj.BaseFace[1]))
+
+	def getInputKey(self, obj):
+		''' return all the inputs the helper face shape depends on '''
+		toolDiameter = 0.0
+		if obj.ToolController:
+			toolDiameter = float(obj.ToolController.Tool.Diameter)
+		toolsKey = None
+		if obj.AllTools:
+			context = getJobContext(obj.Document)
+			job = context.getJob(obj.BaseFace[0])
+			toolsKey = tuple((tc.Label, float(tc.Tool.Diameter)) for tc in context.getToolControllers(job))
+		return (self.getBoundaryKey(obj), toolDiameter, obj.ExtraDist, tuple(obj.CheckedEdges), toolsKey, tuple(obj.EdgeDistances))
+
+	def getExtendDist(self, toolController, extraDist):
+		''' return the distance the checked edges are extended by, the tool radius plus the extra distance '''
+		extendDist = 0
+		if toolController:
+			extendDist = toolController.Tool.Diameter * 0.5
+		return extendDist + extraDist
+
+	def getEdgeDistances(self, extendDist, checkedEdges, extendableEdges, edgeDistances):
+		''' return the extension distance of each checked edge by edge number '''
+		distances = {}
+		for edgeNumber in checkedEdges:
+			distances[edgeNumber] = extendDist
+			if edgeNumber in extendableEdges:
+				idx = extendableEdges.index(edgeNumber)
+				if idx < len(edgeDistances):
+					distances[edgeNumber] += edgeDistances[idx]
+		return distances
+
+	def getBoundary(self, obj, edgeManager=None, boundaryKey=None):
+		''' return the boundary edges and extendable edge numbers, rediscovering them only when the inputs change '''
+		if edgeManager is None:
+			edgeManager = HelperEdgeManager()
+
+		if boundaryKey is None:
+			boundaryKey = self.getBoundaryKey(obj)
+		if self._boundary is not None and self._boundary[0] == boundaryKey:
+			return self._boundary[1], self._boundary[2]
+
+		self._boundary = None
+		if self._storedBoundary is not None:
+			## a boundary saved in the document is only read once, when it still matches the inputs
+			storedKey, edges, extendableEdges = self._storedBoundary
+			self._storedBoundary = None
+			if storedKey == self.getStoredKey(obj, boundaryKey):
+				profiler.count('storedBoundaries')
+				self._boundary = (boundaryKey, edges, extendableEdges)
+				return edges, extendableEdges
+
+		model = obj.BaseFace[0]
+		context = getJobContext(model.Document)
+		job = context.getJob(model)
+		stockShape = context.getStock(job)
+		with profiler.stage('getEdges'):
+			helperEdges = edgeManager.getShapeEdges(model.Shape, obj.BaseFace[1], stockShape.BoundBox, model.Name, stockShape, job.Stock.Name)
 
 		if len(helperEdges) < 3:
-			FreeCAD.Console.PrintError('Helper Face Generation Failed\n')
-			return
+			return None, None
 
 		edges = []
 		extendableEdges = []
+		start = profiler.start()
 		for idx, helperEdge in enumerate(helperEdges):
 			if helperEdge._isExtendable():
 				extendableEdges.append(idx+1)
 			edge = helperEdge._getEdge()
 			edges.append(edge)
+		profiler.stop('classification', start)
+
+		FreeCAD.Console.PrintLog('Helper Face classification cache: {hits} hits, {misses} misses\n'.format(**insideCache.stats()))
+		self._boundary = (boundaryKey, edges, extendableEdges)
+		self.storeBoundary(obj, boundaryKey, edges, extendableEdges)
+		return edges, extendableEdges
+
+	def getCachedBoundary(self):
+		''' return the boundary edges and extendable edge numbers of the last recompute, or (None, None) '''
+		boundary = getattr(self, '_boundary', None)
+		if boundary is None:
+			return None, None
+		return boundary[1], boundary[2]
+
+	def setBoundary(self, obj, edges, extendableEdges):
+		''' store a boundary computed elsewhere so the next recompute does not rediscover it '''
+		boundaryKey = self.getBoundaryKey(obj)
+		self._boundary = (boundaryKey, edges, extendableEdges)
+		self.storeBoundary(obj, boundaryKey, edges, extendableEdges)
 
-		extendDist = 0
+	def execute(self, obj):
+		""" Called on document recompute """
+		if not hasattr(self, '_boundary'):
+			self._boundary = None
+			self._storedBoundary = None
+			self._inputKey = None
+			self._extendedFaces = {}
+			self._facesKey = None
+
+		profileMode = getProfileMode()
+		if not profileMode:
+			self.buildShape(obj)
+			return
 
-		if obj.ToolController:
-			toolRad = obj.ToolController.Tool.Diameter * 0.5
-			extendDist = toolRad
-		
-		extendDist += obj.ExtraDist
-		
-		obj.ExtendableEdges = extendableEdges
-		newFace = edgeManager.createFace(edges)
-		obj.Shape = edgeManager.extendFace(edges, obj.CheckedEdges, newFace, extendDist)
+		profiler.reset()
+		profiler.enabled = True
+		profileName = os.path.join(tempfile.gettempdir(), 'PathHelperFace_{}_{}'.format(obj.Name, int(time.time())))
+		try:
+			with profiler.stage('execute'):
+				if profileMode == 'cprofile':
+					profile = cProfile.Profile()
+					profile.runcall(self.buildShape, obj)
+					profile.dump_stats(profileName + '.prof')
+				else:
+					self.buildShape(obj)
+		finally:
+			profiler.enabled = False
+
+		stats = json.dumps(profiler.report(), sort_keys=True)
+		self.addProperties(obj)
+		obj.ProfileStats = stats
+		if profileMode == 'json':
+			with open(profileName + '.json', 'w') as f:
+				f.write(stats)
+		FreeCAD.Console.PrintLog('Helper Face profile {}: {}\n'.format(obj.Name, stats))
+
+	def buildShape(self, obj):
+		''' generate the helper face shape, unless none of its inputs have changed since it was last generated '''
+		self.addProperties(obj)
+		if not self.resolveBaseFace(obj):
+			## the old face name may now be an unrelated face, keep the previous shape
+			return
+		inputKey = self.getInputKey(obj)
+		if inputKey == self._inputKey and not obj.Shape.isNull():
+			profiler.count('unchangedRecomputes')
+			return
+
+		self._inputKey = None
+		edges, extendableEdges = self.getBoundary(obj, boundaryKey=inputKey[0])
+
+		if edges is None:
+			FreeCAD.Console.PrintError('Helper Face Generation Failed\n')
+			return
+
+		if obj.ExtendableEdges != extendableEdges:
+			## keep the per edge distances of the edges that are still extendable
+			oldDistances = dict(zip(obj.ExtendableEdges, obj.EdgeDistances))
+			obj.ExtendableEdges = extendableEdges
+			obj.EdgeDistances = [oldDistances.get(edgeNumber, 0.0) for edgeNumber in extendableEdges]
+		if FreeCAD.GuiUp:
+			## clear the selection to ensure no weird graphics
+			FreeCADGui.Selection.clearSelection()
+
+		## the extended faces only stay valid while the boundary and the edge settings are unchanged
+		facesKey = (inputKey[0], tuple(obj.CheckedEdges), tuple(obj.EdgeDistances))
+		if facesKey != self._facesKey:
+			self._extendedFaces = {}
+			self._facesKey = facesKey
+
+		obj.Shape = self.getExtendedFace(obj, edges, self.getExtendDist(obj.ToolController, obj.ExtraDist))
+		if obj.AllTools:
+			self.setToolFaces(obj, edges)
+		elif obj.ToolFaceLabels:
+			obj.ToolFaces = Part.Shape()
+			obj.ToolFaceLabels = []
+		## the edge distances may have been remapped to the new extendable edges
+		self._inputKey = inputKey[:-1] + (tuple(obj.EdgeDistances),)
+
+
+	def getExtendedFace(self, obj, edges, extendDist):
+		''' return the face extended by extendDist, each distance is only built once '''
+		distKey = round(extendDist, 6)
+		face = self._extendedFaces.get(distKey)
+		if face is None:
+			edgeDistances = self.getEdgeDistances(extendDist, obj.CheckedEdges, obj.ExtendableEdges, obj.EdgeDistances)
+			face = extendBoundary(edges, obj.CheckedEdges, extendDist, edgeDistances)
+			if face is not None:
+				self._extendedFaces[distKey] = face
+		else:
+			profiler.count('extendedFaceHits')
+		return face
+
+	def setToolFaces(self, obj, edges):
+		''' store the faces extended for every tool controller of the job, tools of the same diameter share a face '''
+		context = getJobContext(obj.Document)
+		job = context.getJob(obj.BaseFace[0])
+		faces = []
+		labels = []
+		for tc in context.getToolControllers(job):
+			face = self.getExtendedFace(obj, edges, self.getExtendDist(tc, obj.ExtraDist))
+			if face is not None:
+				## a compound drops repeated sub shapes, each tool needs its own copy
+				faces.append(face.copy())
+				labels.append(tc.Label)
+
+		obj.ToolFaces = Part.Compound(faces)
+		obj.ToolFaceLabels = labels
 
 
 class ViewProviderHelperFace:
@@ -165,6 +570,7 @@ class ViewProviderHelperFace:
 	   
 	def setEdit(self, vobj, mode=0):
 		# pylint: disable=unused-argument
+		import PathHelperFaceGui
 		panel = PathHelperFaceGui.PathHelperPanel(vobj.Object)
 		FreeCADGui.Control.showDialog(panel)
 		return False
@@ -176,314 +582,199 @@ class ViewProviderHelperFace:
 	def getIcon(self):
 		return os.path.join( iconPath , 'Path_HelperFace.svg')
 
-class HelperEdgeManager:
-	def __init__(self):
-		self.helperEdges = []
-
-	def showEdge(self, edges):
-		Wire = Part.Wire(edges)
-		edgeName = 'testEdge'
-		Part.show(Wire, edgeName) 
-		FreeCAD.ActiveDocument.recompute()
-
-	def getEndPoints(self):
-		points = []
-		for helperEdge in self.helperEdges:
-			edge = helperEdge._getEdge()
-			for v in edge.Vertexes:
-				points.append(v.Point)
-
-		### Find the two points that are not connected ###
-		endPoints = []
-		for p in points:
-			if points.count(p) == 1:
-				endPoints.append(Part.Vertex(p))
+def extendBoundary(edges, checkedEdges, extendDist, edgeDistances=None, showFailed=True):
+	''' build the helper face from the boundary edges and extend the checked edges.
+		without showFailed it only touches the supplied edges, so it can run on a worker thread for a preview '''
+	edgeManager = HelperEdgeManager()
+	## extendFace modifies the edge list, work on a copy so the cached boundary is preserved
+	return edgeManager.buildFace(list(edges), checkedEdges, extendDist, edgeDistances, showFailed)
+
+def getToolFace(obj, toolController):
+	''' return the face of the helper face object extended for the tool controller.
+		returns None unless AllTools generated a face for it '''
+	if toolController is None or toolController.Label not in getattr(obj, 'ToolFaceLabels', []):
+		return None
+	return obj.ToolFaces.Faces[obj.ToolFaceLabels.index(toolController.Label)]
 
-		return endPoints
+def addHelperFace(job, baseFace, toolController=None):
+	''' add a helper face object for the baseFace to the job helper geometry group without recomputing '''
+	model = baseFace[0]
+	helperGrp = getJobContext(model.Document).getHelperGroup(job)
 
+	objName = model.Name
+	faceName = baseFace[1]
+	if not isinstance(faceName, str):
+		## merged faces are named after the first face
+		faceName = faceName[0]
+	modelFaceName = objName + '.' + faceName 	
 
-	def getEdges(self, baseFace):
-		model = baseFace[0]
-		face = model.Shape.getElement(baseFace[1][0])
-		wire = face.OuterWire
-		job = PathUtils.findParentJob(model)
-		
-		stock = job.Stock
-		bb = stock.Shape.BoundBox
-
-		for edge in wire.Edges:
-			newEdge = HelperEdge(edge, model)
-			if not newEdge._isExtendable():
-				self.helperEdges.append(newEdge)
-
-		###### get boundingbox edges at face z height ######
-		bbEdges=[]
-		bbz = face.BoundBox.ZMax
-		bbEdges.append(Part.Edge(Part.LineSegment(FreeCAD.Vector(bb.XMin,bb.YMin,bbz), FreeCAD.Vector(bb.XMin,bb.YMax,bbz))))
-		bbEdges.append(Part.Edge(Part.LineSegment(FreeCAD.Vector(bb.XMin,bb.YMax,bbz), FreeCAD.Vector(bb.XMax,bb.YMax,bbz))))
-		bbEdges.append(Part.Edge(Part.LineSegment(FreeCAD.Vector(bb.XMax,bb.YMax,bbz), FreeCAD.Vector(bb.XMax,bb.YMin,bbz))))
-		bbEdges.append(Part.Edge(Part.LineSegment(FreeCAD.Vector(bb.XMax,bb.YMin,bbz), FreeCAD.Vector(bb.XMin,bb.YMin,bbz))))
-
-		if not len(self.helperEdges):
-			FreeCAD.Console.PrintWarning('Open Face Selected')
-			objBBz = model.Shape.BoundBox.ZMax
-
-			if round(bbz, 5) == round(objBBz, 5):
-				FreeCAD.Console.PrintWarning('Top face of object selected')
-				for edge in bbEdges:
-					newEdge = HelperEdge(edge, model)
-					self.helperEdges.append(newEdge)
-			
-				# Check if the helper edges are available and return
-				if len(self.helperEdges):
-					return self.helperEdges
-			
-		endPoints = self.getEndPoints()
-
-		if not endPoints:
-			## No end points generated, face generation failed, return the list of helper edges and exit cleanly. 
-			return self.helperEdges
-		else:
-			## if a single fixed edge cannot be generated return all the edges from the selected face
-			if len(endPoints) > 2:
-				self.helperEdges = []
-				for edge in wire.Edges:
-					newEdge = HelperEdge(edge, model)
-					self.helperEdges.append(newEdge)
-
-				return self.helperEdges	
-
-		## get edge edges ##
-		stockIntersectPoints = []
-		bbStockEdges = []
-		bbConnEdges = []
-		tempEdges = self.helperEdges.copy()
-		for ep in endPoints:
-			intersections = []
-				
-			for i, newEdge in enumerate(tempEdges):
-				edge = newEdge._getEdge()
-				for v in edge.Vertexes:	
-					if self.isSamePoint(ep.Point, v.Point):	
-						for bbedge in bbEdges:
-							## get the intersection point with the stock edge
-							if Part.Circle == type(edge.Curve):
-								## get the direction of the end points
-								tangent = edge.tangentAt(edge.FirstParameter).negative()
-								if self.isSamePoint(ep.Point, edge.lastVertex().Point):
-									tangent = edge.tangentAt(edge.LastParameter)
-								normal = tangent
-								# ## If the normal generates a point inside the model rotate the normal by 90 deg 
-								testPoint = ep.Point + 0.01 * tangent
-
-								## if the test point is inside the model take the normal from the circle centre to the end point.
-								if model.Shape.isInside(testPoint, 0.005, True):
-									normal = ep.Point.sub(edge.Curve.Location).normalize()
-
-								endPoint = ep.Point + 5 * normal
-								tempEdge = Part.Edge(Part.LineSegment(ep.Point, FreeCAD.Vector(endPoint.x, endPoint.y, endPoint.z)))
-								intersectPts = tempEdge.Curve.intersectCC(bbedge.Curve)
-							else:
-								## edge is a line
-								## get the normal if the element is a line
-								normal = edge.lastVertex().Point.sub(edge.firstVertex().Point)
-								if self.isSamePoint(ep.Point, edge.firstVertex().Point):
-									normal = edge.firstVertex().Point.sub(edge.lastVertex().Point)
-
-								normal = normal.normalize()
-								intersectPts = edge.Curve.intersectCC(bbedge.Curve)
-
-							if len(intersectPts):
-								for pnt in intersectPts:
-									tempPnt = FreeCAD.Vector(pnt.X, pnt.Y, pnt.Z)
-									posOnEdge = bbedge.Curve.parameter(tempPnt)
-									if not posOnEdge < 0 and not posOnEdge > bbedge.LastParameter:
-										intersections.append(pnt)
-										bbStockEdges.append(bbedge)
-										vectorCompare = tempPnt.sub(v.Point).normalize()
-										dist = vectorCompare.sub(normal).Length
-
-										if dist < 0.01:
-											extEdge = Part.Edge(Part.LineSegment(ep.Point, tempPnt))
-											newEdge = HelperEdge(extEdge, model, True)
-											self.helperEdges.append(newEdge)
-											bbConnEdges.append(bbedge)
-											stockIntersectPoints.append(tempPnt)	
-
-		###### check if the bb edges are the same edge ######
-		if len(bbConnEdges) == 2:
-			if bbConnEdges[0] == bbConnEdges[1]:
-				###### Create new connecting edge and add to the list of edges ######
-				closeEdge = Part.Edge(Part.LineSegment(stockIntersectPoints[0], stockIntersectPoints[1]))
-				newEdge = HelperEdge(closeEdge, model)
-				self.helperEdges.append(newEdge)
-			else:				
-				###### check if the bb edges are connected ######
-				bbEdgesConnected = False
-				for v1 in bbConnEdges[0].Vertexes:
-					for v2 in bbConnEdges[1].Vertexes:
-						if self.isSamePoint(v1.Point, v2.Point):
-							bbEdgesConnected = True
-							###### Create new edges to the stock and add to the list of edges ######
-							for pnt in stockIntersectPoints:
-								edge = Part.Edge(Part.LineSegment(pnt, v1.Point))
-								newEdge = HelperEdge(edge, model)
-								self.helperEdges.append(newEdge)
-
-				if not bbEdgesConnected:
-					offsetDir = FreeCAD.Vector()
-					edgeNormals = []
-					for helperEdge in self.helperEdges:
-						edgeNormals.append(helperEdge._getPerpNormal())
-
-					for edgeVec in edgeNormals:
-						offsetDir.x += edgeVec.x
-						offsetDir.y += edgeVec.y
-						offsetDir.z += edgeVec.z
-
-					offsetDir = offsetDir.normalize()
-
-					closingPts = []
-					for i, pnt in enumerate(stockIntersectPoints):
-						for v in bbConnEdges[i].Vertexes:
-							vectorCompare = v.Point.sub(pnt).normalize()
-							dist = vectorCompare.sub(offsetDir).Length
-
-							#if self.isSamePoint(offsetDir, vectorCompare):
-							if dist < 0.5: #TODO: Is checking the dist robust?
-								closingPts.append(v.Point)
-								edge = Part.Edge(Part.LineSegment(pnt, v.Point))
-								newEdge = HelperEdge(edge, model)
-								self.helperEdges.append(newEdge)
-						
-					if len(closingPts) == 2:
-						edge = Part.Edge(Part.LineSegment(closingPts[0], closingPts[1]))
-						newEdge = HelperEdge(edge, model)
-						self.helperEdges.append(newEdge)
-
-		if len(self.helperEdges):
-			self.sortEdges()
-			return self.helperEdges
-		
-		return face.Edges
-
-	def sortEdges(self):
-		''' sort the helper edges into a continous loop '''
-		fcEdges = []
-		for helperEdge in self.helperEdges:
-			edge = helperEdge._getEdge()
-			fcEdges.append(edge)
-
-		sortedEdges = Part.__sortEdges__(fcEdges)
-		sortedHelperEdges = []
-
-		for edge in sortedEdges:
-			for helperEdge in self.helperEdges:
-				v1_1 = edge.firstVertex()
-				v1_2 = edge.lastVertex()
-				v2_1 = helperEdge._getEdge().firstVertex()
-				v2_2 = helperEdge._getEdge().lastVertex()
-
-				if self.isSamePoint(v1_1.Point, v2_1.Point) and self.isSamePoint(v1_2.Point, v2_2.Point) \
-					or	self.isSamePoint(v1_1.Point, v2_2.Point) and self.isSamePoint(v1_2.Point, v2_1.Point):
-					sortedHelperEdges.append(helperEdge)
-
-		self.helperEdges = sortedHelperEdges
-
-	def createFace(self, edges):
-		''' create a new face using from the supplied edges'''
-		finalWire = Part.Wire(edges)
-		if not finalWire.isClosed():
-			FreeCAD.Console.PrintError('Face Creation failed - wire not closed')
-			self.showEdge(edges)
-			return None
-		else:		
-			nface = Part.Face(finalWire, "Part::FaceMakerBullseye")
+	helperFaceName = modelFaceName + '_Helper'
+	obj = helperGrp.newObject('Part::FeaturePython', helperFaceName)
 	
-		return nface
-
-	def isSamePoint(self, pt1, pt2):
-		''' Checks if two points share the same coordinates '''
-		if round(pt1.x, 5) == round(pt2.x, 5):
-			if round(pt1.y, 5) == round(pt2.y, 5):
-				if round(pt1.z, 5) == round(pt2.z, 5):
-					return True
-		
-		return False
-
-	def extendFace(self, edges, checkedEdges, face, extendDist=0):
-		''' extend the selected edges '''
-
-		newEdges = edges
-		if len(checkedEdges):
-			for e in checkedEdges:
-				origEdge = newEdges[int(e) -1]
-				if origEdge:
-					p1 = origEdge.Vertexes[0].Point
-					p2 = origEdge.Vertexes[1].Point
-
-					## work out the direction the edge needs to be extended
-					vec = p2.sub(p1)
-					offsetDir = self.rotate(vec, 1.5708)
-					offsetDir = offsetDir.normalize()
-					cen = face.BoundBox.Center
-					if cen.distanceToPoint(p1.add(offsetDir)) <  cen.distanceToPoint(p1):
-						offsetDir = offsetDir.negative()
-				
-					## the direction is a normalised vector. multiply that by the distance required
-					offset = offsetDir.multiply(extendDist)
-
-					for i, repEdge in enumerate(newEdges):
-						rev = repEdge.Vertexes
-						for j, v in enumerate(rev):
-							jOpp = 1 - j
-							if self.isSamePoint(v.Point, p1) or self.isSamePoint(v.Point, p2):
-								tempVerts = newEdges[i].Vertexes
-								newEdge = Part.Edge(Part.LineSegment(tempVerts[j].Point.add(offset), tempVerts[jOpp].Point))
-								newEdges.pop(i)
-								newEdges.insert(i, newEdge)
-
-		## clear the selection to ensure no weird graphics
-		FreeCADGui.Selection.clearSelection()
-		newFace = self.createFace(newEdges)
-		if not newFace:
-			FreeCAD.Console.PrintError('Face Extension Failed')
-		else:
-			return newFace
-		
-	def rotate(self, vec, angle):
-		''' rotate the vector by the supplied angle in radians '''
-		x = vec.x * math.cos(angle) - vec.y * math.sin(angle)
-		y = vec.x * math.sin(angle) + vec.y * math.cos(angle)
-		return FreeCAD.Vector(x, y, vec.z)
+	HelperFace(obj, baseFace, toolController)
+	if FreeCAD.GuiUp:
+		ViewProviderHelperFace(obj.ViewObject)
+	return obj
 
 def create(baseFace):
 
 	model = baseFace[0]
-	job = PathUtils.findParentJob(model)
-	doc = model.Document
+	job = getJobContext(model.Document).getJob(model)
 	
 	if job is None:
 		#msgBox = QMessageBox()
 		#msgBox.setText("Select Face from Job Model")
 		#msgBox.exec_()
-		QMessageBox.warning(None, "Invalid Model", "Select Face from a model within the job object")
+		if FreeCAD.GuiUp:
+			QMessageBox.warning(None, "Invalid Model", "Select Face from a model within the job object")
+		else:
+			FreeCAD.Console.PrintError('Select Face from a model within the job object\n')
 		return None
 
-	helperGrpName = job.Name + '_HelperGeometry'
-	helperGrp = doc.getObject(helperGrpName)
-	
-	if not helperGrp:
-		helperGrp = doc.addObject("App::DocumentObjectGroup", helperGrpName)
-
-	objName = model.Name
-	faceName = baseFace[1]
-	modelFaceName = objName + '.' + faceName 	
-
-	helperFaceName = modelFaceName + '_Helper'
-	obj = helperGrp.newObject('Part::FeaturePython', helperFaceName)
-	
-	HelperFace(obj, baseFace)
-	ViewProviderHelperFace(obj.ViewObject)
+	obj = addHelperFace(job, baseFace)
 	FreeCAD.ActiveDocument.recompute()
-	return obj
\ No newline at end of file
+	return obj
+
+def mergeSelections(selections):
+	''' merge the adjacent coplanar faces of each model in the (model, faceName) selections.
+		a merged selection holds the list of its face names, faces without a neighbour are unchanged.
+		only upward facing planar faces are merged, others are kept as they are '''
+	levels = collections.OrderedDict()
+	merged = []
+	for model, faceName in selections:
+		face = model.Shape.getElement(faceName)
+		if not isLevelFace(face):
+			merged.append((model, faceName))
+			continue
+		z = round(face.BoundBox.ZMax, 5)
+		levels.setdefault((model.Name, z), (model, []))[1].append(faceName)
+
+	for model, faceNames in levels.values():
+		for group in groupAdjacentFaces(model.Shape, faceNames):
+			merged.append((model, group if len(group) > 1 else group[0]))
+	return merged
+
+def createMany(selections, toolController=None, merge=False):
+	''' create helper faces for a list of (model, faceName) selections with a single document recompute.
+		adjacent coplanar faces share one helper face when merge is set.
+		returns a list of (baseFace, obj, error) tuples, obj is None when the helper face could not be created '''
+	if merge:
+		selections = mergeSelections(selections)
+
+	results = []
+	edgeManager = HelperEdgeManager()
+	docs = []
+
+	for baseFace in selections:
+		model = baseFace[0]
+		job = getJobContext(model.Document).getJob(model)
+
+		if job is None:
+			results.append((baseFace, None, 'Face is not part of a model within a job object'))
+			continue
+
+		obj = addHelperFace(job, baseFace, toolController)
+		## discover the boundary now so the recompute can reuse it, a failing face must not abort the others
+		try:
+			obj.Proxy.getBoundary(obj, edgeManager)
+		except Exception as e:
+			results.append((baseFace, obj, 'Helper Face Generation Failed: {}'.format(e)))
+		else:
+			results.append((baseFace, obj, None))
+
+		if model.Document not in docs:
+			docs.append(model.Document)
+
+	for doc in docs:
+		doc.recompute()
+
+	for i, (baseFace, obj, error) in enumerate(results):
+		if obj is not None and error is None and obj.Shape.isNull():
+			results[i] = (baseFace, obj, 'Helper Face Generation Failed')
+
+	return results
+
+def getJobSelections(job):
+	''' return the (model, faceName) selections of the upward facing planar faces with an open boundary in the job models.
+		faces that already have a helper face are skipped '''
+	context = getJobContext(job.Document)
+	existing = set()
+	for obj in context.getHelperGroup(job).Group:
+		if isinstance(getattr(obj, 'Proxy', None), HelperFace):
+			existing.update((obj.BaseFace[0].Name, faceName) for faceName in obj.BaseFace[1])
+
+	selections = []
+	for model in job.Model.Group:
+		if not hasattr(model, 'Shape') or model.Shape.isNull():
+			continue
+		for faceName in getOpenFaces(model.Shape, model.Name):
+			if (model.Name, faceName) not in existing:
+				selections.append((model, faceName))
+
+	return selections
+
+def createForJob(job, toolController=None):
+	''' create helper faces for all the open horizontal faces of the job models with a single recompute.
+		returns the createMany results '''
+	return createMany(getJobSelections(job), toolController)
+
+def createManyParallel(selections, toolController=None, maxWorkers=None):
+	''' headless variant of createMany that computes the boundaries in a pool of worker processes.
+		the helper face objects are created in this process once the workers have finished '''
+	if FreeCAD.GuiUp or 'fork' not in multiprocessing.get_all_start_methods():
+		## workers are forked from this process, never fork the gui
+		return createMany(selections, toolController)
+
+	if maxWorkers is None:
+		maxWorkers = os.cpu_count() or 1
+
+	results = []
+	models = {}
+	for baseFace in selections:
+		model = baseFace[0]
+		if getJobContext(model.Document).getJob(model) is None:
+			results.append((baseFace, None, 'Face is not part of a model within a job object'))
+			continue
+		models.setdefault(model.Name, (model, []))[1].append(baseFace[1])
+
+	## split the faces of each model into chunks so every worker shares a single copy of the shape
+	tasks = []
+	for model, faceNames in models.values():
+		brep = model.Shape.exportBrepToString()
+		context = getJobContext(model.Document)
+		stockShape = context.getStock(context.getJob(model))
+		stockBrep = stockShape.exportBrepToString()
+		bb = stockShape.BoundBox
+		stockBounds = (bb.XMin, bb.YMin, bb.ZMin, bb.XMax, bb.YMax, bb.ZMax)
+		chunkSize = max(1, -(-len(faceNames) // maxWorkers))
+		for i in range(0, len(faceNames), chunkSize):
+			tasks.append((model, (brep, faceNames[i:i + chunkSize], stockBounds, stockBrep)))
+
+	with ProcessPoolExecutor(max_workers=maxWorkers, mp_context=multiprocessing.get_context('fork')) as executor:
+		boundaries = executor.map(computeBoundaries, [task for model, task in tasks])
+
+		docs = []
+		for (model, task), taskResults in zip(tasks, boundaries):
+			for faceName, brep, extendableEdges in taskResults:
+				baseFace = (model, faceName)
+				obj = addHelperFace(getJobContext(model.Document).getJob(model), baseFace, toolController)
+				if brep is None:
+					results.append((baseFace, obj, 'Helper Face Generation Failed'))
+					continue
+
+				edges = Part.Shape()
+				edges.importBrepFromString(brep)
+				obj.Proxy.setBoundary(obj, edges.Edges, extendableEdges)
+				results.append((baseFace, obj, None))
+
+			if model.Document not in docs:
+				docs.append(model.Document)
+
+	for doc in docs:
+		doc.recompute()
+
+	for i, (baseFace, obj, error) in enumerate(results):
+		if error is None and obj.Shape.isNull():
+			results[i] = (baseFace, obj, 'Helper Face Generation Failed')
+
+	return results
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2020 Daniel Wood <s.d.wood.82@googlemail.com>            *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+
+"""Command line entry point to generate helper faces in a FreeCAD document without the GUI.
+
+Run with FreeCADCmd or a python interpreter that can import FreeCAD:
+
+    python3 PathHelperFaceCmd.py part.FCStd Body.Face12 Body.Face14 --tool-controller TC001 --output out.FCStd
+    python3 PathHelperFaceCmd.py part.FCStd --job Job --workers 8
+"""
+
+import argparse
+import sys
+
+def parseArgs(argv):
+	parser = argparse.ArgumentParser(prog='PathHelperFaceCmd', description='Generate Path helper faces for faces of job models')
+	parser.add_argument('document', help='FreeCAD document (.FCStd) containing the job')
+	parser.add_argument('faces', nargs='*', help='face selectors in the form ObjectName.FaceN, object labels are also accepted')
+	parser.add_argument('--job', help='label of a job, helper faces are created for all the open horizontal faces of its models')
+	parser.add_argument('--tool-controller', dest='toolController', help='label of the tool controller used to extend the faces')
+	parser.add_argument('--extra-dist', dest='extraDist', type=float, default=0.0, help='additional extension distance')
+	parser.add_argument('--merge', action='store_true', help='create a single helper face for adjacent coplanar faces')
+	parser.add_argument('--workers', type=int, default=1, help='number of worker processes used to compute the boundaries')
+	parser.add_argument('--output', help='path to save the document to, the input document is overwritten when omitted')
+	return parser.parse_args(argv)
+
+def resolveFace(doc, selector):
+	''' return the (model, faceName) tuple for an ObjectName.FaceN selector '''
+	objName, _, faceName = selector.rpartition('.')
+	if not objName or not faceName.startswith('Face'):
+		return None
+
+	model = doc.getObject(objName)
+	if model is None:
+		models = doc.getObjectsByLabel(objName)
+		model = models[0] if models else None
+	if model is None:
+		return None
+
+	return (model, faceName)
+
+def main(argv=None):
+	args = parseArgs(sys.argv[1:] if argv is None else argv)
+
+	import FreeCAD
+	import PathHelperFace
+
+	doc = FreeCAD.openDocument(args.document)
+
+	selections = []
+	for selector in args.faces:
+		baseFace = resolveFace(doc, selector)
+		if baseFace is None:
+			FreeCAD.Console.PrintError('Invalid face selector: {}\n'.format(selector))
+			return 2
+		selections.append(baseFace)
+
+	if args.job:
+		jobs = doc.getObjectsByLabel(args.job)
+		if not jobs:
+			FreeCAD.Console.PrintError('Job not found: {}\n'.format(args.job))
+			return 2
+		selections.extend(baseFace for baseFace in PathHelperFace.getJobSelections(jobs[0]) if baseFace not in selections)
+
+	if not selections:
+		FreeCAD.Console.PrintError('No faces to create helper faces for\n')
+		return 2
+
+	toolController = None
+	if args.toolController:
+		toolControllers = doc.getObjectsByLabel(args.toolController)
+		if not toolControllers:
+			FreeCAD.Console.PrintError('Tool controller not found: {}\n'.format(args.toolController))
+			return 2
+		toolController = toolControllers[0]
+
+	if args.merge:
+		selections = PathHelperFace.mergeSelections(selections)
+
+	if args.workers > 1:
+		results = PathHelperFace.createManyParallel(selections, toolController, args.workers)
+	else:
+		results = PathHelperFace.createMany(selections, toolController)
+
+	if args.extraDist:
+		for baseFace, obj, error in results:
+			if obj is not None:
+				obj.ExtraDist = args.extraDist
+		## the boundaries are cached, this recompute only extends the faces
+		doc.recompute()
+
+	failed = 0
+	for baseFace, obj, error in results:
+		faceName = '{}.{}'.format(baseFace[0].Name, baseFace[1])
+		if error:
+			failed += 1
+			FreeCAD.Console.PrintError('{}: {}\n'.format(faceName, error))
+		else:
+			FreeCAD.Console.PrintMessage('{}: created {}\n'.format(faceName, obj.Name))
+
+	if args.output:
+		doc.saveAs(args.output)
+	else:
+		doc.save()
+
+	FreeCAD.closeDocument(doc.Name)
+	return 1 if failed else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
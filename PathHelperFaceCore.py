@@ -0,0 +1,1553 @@
+# -*- coding: utf-8 -*-
+
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2020 Daniel Wood <s.d.wood.82@googlemail.com>            *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+"""GUI free geometry engine for the helper faces, safe to use under FreeCADCmd."""
+
+import FreeCAD
+import Part
+import math
+import os
+import time
+import threading
+import collections
+import numpy
+
+paramPath = 'User parameter:BaseApp/Preferences/Mod/PathHelperFace'
+
+def getProfileMode():
+	''' return the profiling mode set by the PATHHELPERFACE_PROFILE environment variable or the Profile parameter.
+		'' disables profiling, 'json' and 'cprofile' also dump the results to a file, any other value only records them '''
+	mode = os.environ.get('PATHHELPERFACE_PROFILE')
+	if mode is None:
+		mode = FreeCAD.ParamGet(paramPath).GetString('Profile', '')
+	mode = mode.strip().lower()
+	if mode in ('0', 'false', 'off'):
+		return ''
+	return mode
+
+class _ProfileStage:
+	def __init__(self, profiler, name):
+		self._profiler = profiler
+		self._name = name
+
+	def __enter__(self):
+		self._start = time.perf_counter()
+		return self
+
+	def __exit__(self, *args):
+		self._profiler.stop(self._name, self._start)
+		return False
+
+class _NullStage:
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		return False
+
+_nullStage = _NullStage()
+
+class Profiler:
+	''' opt in stage timings and call counters, each call is a single attribute check when disabled.
+		the counters are not thread safe, only the thread that enabled the profiler is profiled '''
+	def __init__(self):
+		self._enabled = False
+		self._thread = None
+		self.timings = collections.defaultdict(float)
+		self.counts = collections.Counter()
+
+	@property
+	def enabled(self):
+		return self._enabled and threading.get_ident() == self._thread
+
+	@enabled.setter
+	def enabled(self, enabled):
+		self._enabled = enabled
+		self._thread = threading.get_ident()
+
+	def start(self):
+		''' return a start token for stop, None when disabled '''
+		if self.enabled:
+			return time.perf_counter()
+		return None
+
+	def stop(self, name, start):
+		''' add the time since start to the named stage '''
+		if start is not None:
+			self.timings[name] += time.perf_counter() - start
+
+	def stage(self, name):
+		''' context manager timing the named stage '''
+		if self.enabled:
+			return _ProfileStage(self, name)
+		return _nullStage
+
+	def count(self, name, n=1):
+		if self.enabled:
+			self.counts[name] += n
+
+	def reset(self):
+		self.timings.clear()
+		self.counts.clear()
+
+	def report(self):
+		''' return the stage timings in seconds and the call counts '''
+		return {'timings': dict(self.timings), 'counts': dict(self.counts)}
+
+profiler = Profiler()
+
+class InsideCache:
+	''' cache of solid classification results keyed on the shape and a quantized probe point '''
+	def __init__(self, precision=6):
+		self._precision = precision
+		self._results = {}
+		self._owners = {}
+		self.hits = 0
+		self.misses = 0
+
+	def _getResults(self, shape, owner):
+		''' get the result table for the shape, dropping stale tables when the owner's shape changes '''
+		shapeKey = shape.hashCode()
+		if owner is not None:
+			oldKey = self._owners.get(owner)
+			if oldKey is not None and oldKey != shapeKey:
+				self._results.pop(oldKey, None)
+			self._owners[owner] = shapeKey
+
+		## the table keeps its shape so the hash cannot be reused by a new shape while the table exists
+		entry = self._results.get(shapeKey)
+		if entry is None or not entry[0].isSame(shape):
+			entry = (shape, {})
+			self._results[shapeKey] = entry
+		return entry[1]
+
+	def isInside(self, shape, pnt, tolerance, checkFace, owner=None):
+		''' return shape.isInside for the point, using the cached result where available '''
+		results = self._getResults(shape, owner)
+		pntKey = (round(pnt.x, self._precision), round(pnt.y, self._precision), round(pnt.z, self._precision), tolerance, checkFace)
+
+		if pntKey in results:
+			self.hits += 1
+			profiler.count('isInsideCacheHits')
+			return results[pntKey]
+
+		self.misses += 1
+		profiler.count('isInside')
+		inside = shape.isInside(pnt, tolerance, checkFace)
+		results[pntKey] = inside
+		return inside
+
+	def isInsideRows(self, shape, rows, tolerance, checkFace, owner=None):
+		''' return shape.isInside for each row of an (n, 3) array of points, a vector is only built for the uncached points '''
+		results = self._getResults(shape, owner)
+		inside = numpy.empty(len(rows), dtype=bool)
+		for i, pntKey in enumerate(map(tuple, numpy.round(rows, self._precision).tolist())):
+			pntKey += (tolerance, checkFace)
+			if pntKey in results:
+				self.hits += 1
+				profiler.count('isInsideCacheHits')
+			else:
+				self.misses += 1
+				profiler.count('isInside')
+				results[pntKey] = shape.isInside(toVector(rows[i]), tolerance, checkFace)
+			inside[i] = results[pntKey]
+		return inside
+
+	def clear(self):
+		''' remove all cached results and reset the counters '''
+		self._results = {}
+		self._owners = {}
+		self.hits = 0
+		self.misses = 0
+
+	def stats(self):
+		''' return the hit and miss counters '''
+		return {'hits': self.hits, 'misses': self.misses}
+
+insideCache = InsideCache()
+
+def pointKey(pnt, precision=5):
+	''' return the quantized coordinates used to match coincident points '''
+	return (round(pnt.x, precision), round(pnt.y, precision), round(pnt.z, precision))
+
+class ShapeCache:
+	''' bounded cache of data derived from shapes, keyed by shape hash.
+		each entry keeps its shape, so the hash cannot be reused by another shape, and is confirmed with isSame '''
+	def __init__(self, size=16):
+		self._size = size
+		self._entries = collections.OrderedDict()
+
+	def get(self, shape):
+		entry = self._entries.get(shape.hashCode())
+		if entry is not None and entry[0].isSame(shape):
+			return entry[1]
+		return None
+
+	def set(self, shape, value):
+		self._entries[shape.hashCode()] = (shape, value)
+		if len(self._entries) > self._size:
+			self._entries.popitem(last=False)
+
+class VertexIndex:
+	''' index of items by point, coincident points share the same quantized coordinate key '''
+	def __init__(self):
+		self._items = {}
+
+	def add(self, pnt, item=None):
+		self._items.setdefault(pointKey(pnt), []).append(item)
+
+	def get(self, pnt):
+		''' return the items stored at the point '''
+		return self._items.get(pointKey(pnt), [])
+
+	def count(self, pnt):
+		return len(self.get(pnt))
+
+def faceSignature(face):
+	''' geometric fingerprint of a face that is unchanged when a model recompute rebuilds the same face '''
+	centre = face.CenterOfMass
+	u0, u1, v0, v1 = face.ParameterRange
+	normal = face.normalAt(0.5 * (u0 + u1), 0.5 * (v0 + v1))
+	return (round(face.Area, 6), pointKey(centre, 6), pointKey(normal, 4), len(face.Edges))
+
+## maps of edge hash to the indexes of the faces using the edge, by shape
+_edgeFaceMaps = ShapeCache()
+
+def getEdgeFaces(shape):
+	''' return the edge to face index map of the shape, built once per shape '''
+	edgeFaces = _edgeFaceMaps.get(shape)
+	if edgeFaces is None:
+		edgeFaces = {}
+		for i, face in enumerate(shape.Faces):
+			for edge in face.Edges:
+				edgeFaces.setdefault(edge.hashCode(), set()).add(i)
+		_edgeFaceMaps.set(shape, edgeFaces)
+	return edgeFaces
+
+def boundarySignature(shape, faceName):
+	''' fingerprint of the named face and the faces around it, the faces that decide its helper boundary '''
+	face = shape.getElement(faceName)
+	edgeFaces = getEdgeFaces(shape)
+	faceIndexes = set()
+	for edge in face.Edges:
+		faceIndexes |= edgeFaces.get(edge.hashCode(), set())
+
+	faces = shape.Faces
+	return tuple(sorted(faceSignature(faces[i]) for i in faceIndexes))
+
+## face fingerprint indexes by shape
+_faceIndexes = ShapeCache()
+
+def getFaceIndex(shape):
+	''' return the fingerprint to face name index of the shape, and a looser index ignoring the face position.
+		both are built once per shape '''
+	faceIndex = _faceIndexes.get(shape)
+	if faceIndex is None:
+		exact = {}
+		loose = {}
+		for i, face in enumerate(shape.Faces):
+			faceName = 'Face{}'.format(i + 1)
+			signature = faceSignature(face)
+			exact.setdefault(signature, faceName)
+			loose.setdefault((signature[0], signature[2], signature[3]), []).append((signature[1], faceName))
+		faceIndex = (exact, loose)
+		_faceIndexes.set(shape, faceIndex)
+	return faceIndex
+
+def resolveFace(shape, faceName, signature, maxMove=None):
+	''' return the name of the face with the fingerprint, faceName while it still matches and None when no face matches.
+		a face with the same shape is only taken as moved within maxMove of the old centre, by default the square root of its area '''
+	try:
+		if faceSignature(shape.getElement(faceName)) == signature:
+			return faceName
+	except Exception:
+		pass
+
+	exact, loose = getFaceIndex(shape)
+	if signature in exact:
+		return exact[signature]
+
+	## the same face moved, take the nearest face with the same area, normal and edge count
+	candidates = loose.get((signature[0], signature[2], signature[3]))
+	if candidates:
+		centre = signature[1]
+		if maxMove is None:
+			maxMove = math.sqrt(signature[0])
+		distSq, nearest = min((sum((a - b) ** 2 for a, b in zip(c[0], centre)), c[1]) for c in candidates)
+		if distSq <= maxMove ** 2:
+			return nearest
+
+	return None
+
+def perpendicular(vec):
+	''' return the vector turned a quarter turn anticlockwise about the z axis '''
+	return FreeCAD.Vector(-vec.y, vec.x, vec.z)
+
+def perpendicularRows(vectors):
+	''' return the rows of an (n, 3) array turned a quarter turn anticlockwise about the z axis '''
+	turned = vectors.copy()
+	turned[:, 0] = -vectors[:, 1]
+	turned[:, 1] = vectors[:, 0]
+	return turned
+
+def normalizeRows(vectors):
+	''' return the rows of an (n, 3) array scaled to unit length, zero length rows are left unchanged '''
+	lengths = numpy.linalg.norm(vectors, axis=1)
+	lengths[lengths == 0] = 1
+	return vectors / lengths[:, None]
+
+def toVector(row):
+	return FreeCAD.Vector(float(row[0]), float(row[1]), float(row[2]))
+
+class EdgeTable:
+	''' packed arrays of the end points, mid points, tangents and perpendicular normals of a list of edges.
+		each edge is sampled once, the derived vectors are computed for all the edges together '''
+	def __init__(self, edges):
+		count = len(edges)
+		self.edges = edges
+		self.endPoints = []
+		self.starts = numpy.empty((count, 3))
+		self.ends = numpy.empty((count, 3))
+		self.midpoints = numpy.empty((count, 3))
+		self.tangents = numpy.empty((count, 3))
+
+		for i, edge in enumerate(edges):
+			midParam = edge.FirstParameter + 0.5 * (edge.LastParameter - edge.FirstParameter)
+			## a closed edge has a single vertex
+			endPoints = tuple(v.Point for v in edge.Vertexes)
+			self.endPoints.append(endPoints)
+			self.starts[i] = endPoints[0]
+			self.ends[i] = endPoints[-1]
+			self.midpoints[i] = edge.valueAt(midParam)
+			self.tangents[i] = edge.tangentAt(midParam)
+
+		self.normals = perpendicularRows(self.tangents)
+		self.openNormals = None
+		self.extendable = None
+
+	def classify(self, classifier):
+		''' classify the points either side of every mid point and orient the normals towards the open side.
+			returns the extendable flags, set where neither side of the mid point is inside the model '''
+		insidePlus = classifier.isInsideRows(self.midpoints + 0.01 * self.normals)
+		insideMinus = numpy.zeros(len(self.edges), dtype=bool)
+		outside = numpy.flatnonzero(~insidePlus)
+		if len(outside):
+			insideMinus[outside] = classifier.isInsideRows(self.midpoints[outside] - 0.01 * self.normals[outside])
+
+		self.openNormals = numpy.where(insidePlus[:, None], -self.normals, self.normals)
+		self.extendable = ~insidePlus & ~insideMinus
+		return self.extendable
+
+	def chordNormals(self):
+		''' return the unit normals of the edge chords, a quarter turn anticlockwise from the chord direction '''
+		return normalizeRows(perpendicularRows(self.ends - self.starts))
+
+class EdgeClassifier:
+	''' classifies points against a model shape through the shared inside cache.
+		one classifier is shared by all the edges of a boundary '''
+	__slots__ = ('shape', 'owner', 'tolerance')
+
+	def __init__(self, shape, owner=None, tolerance=0.005):
+		self.shape = shape
+		self.owner = owner
+		self.tolerance = tolerance
+
+	def isInside(self, pnt, checkFace=False):
+		return insideCache.isInside(self.shape, pnt, self.tolerance, checkFace, self.owner)
+
+	def isInsideRows(self, rows, checkFace=False):
+		return insideCache.isInsideRows(self.shape, rows, self.tolerance, checkFace, self.owner)
+
+class HelperEdge:
+	''' boundary edge record, the open side normal, end points and extendable flag are computed once when it is built.
+		the edges of a face outline are built from a classified EdgeTable with fromTable '''
+	__slots__ = ('_edge', '_classifier', '_fixedEdge', '_perpNormal', '_endPoints', '_extendable')
+
+	def __init__(self, edge, classifier, fixedEdge=False):
+		self._edge = edge
+		self._classifier = classifier
+		self._fixedEdge = fixedEdge
+
+		midParam = edge.FirstParameter + 0.5 * (edge.LastParameter - edge.FirstParameter)
+		midPnt = edge.valueAt(midParam)
+		## a closed edge has a single vertex
+		self._endPoints = tuple(v.Point for v in edge.Vertexes)
+
+		## orient the perpendicular normal towards the open side,
+		## the edge is only extendable when neither side of its mid point is inside the model
+		normal = perpendicular(edge.tangentAt(midParam))
+		insidePlus = classifier.isInside(midPnt + 0.01 * normal)
+		self._perpNormal = normal.negative() if insidePlus else normal
+		self._extendable = False
+		if not fixedEdge and not insidePlus:
+			self._extendable = not classifier.isInside(midPnt - 0.01 * normal)
+
+	@classmethod
+	def fromTable(cls, table, i, classifier):
+		''' build the record of row i of a classified EdgeTable without sampling the edge again '''
+		helperEdge = cls.__new__(cls)
+		helperEdge._edge = table.edges[i]
+		helperEdge._classifier = classifier
+		helperEdge._fixedEdge = False
+		helperEdge._endPoints = table.endPoints[i]
+		helperEdge._perpNormal = toVector(table.openNormals[i])
+		helperEdge._extendable = bool(table.extendable[i])
+		return helperEdge
+
+	def _getEdge(self):
+		return self._edge
+
+	def _getEndPoints(self):
+		return self._endPoints
+
+	def _getPerpNormal(self):
+		''' get edge perpendicular normal at the mid point in the open direction'''
+		return self._perpNormal
+
+	def _isExtendable(self):
+		''' check if the edge is extendable i.e. constrained by a connected face'''
+		return self._extendable
+
+
+def isBoxStock(stockShape, bb):
+	''' check if the stock fills its bounding box, so the bounding box rectangle is its cross section '''
+	bbVolume = bb.XLength * bb.YLength * bb.ZLength
+	return bbVolume > 0 and abs(stockShape.Volume - bbVolume) < 1e-6 * bbVolume
+
+class StockSilhouette:
+	''' closed polygon of the stock cross section at a z height, with a uniform grid index of its segments.
+		the polygon is only used to find the ray hits, the boundary is closed with the section edges it was built from.
+		loopEdges holds the (edge, reversed) section edges in loop order and segmentEdges the loop edge of each segment '''
+	def __init__(self, points, z, loopEdges=None, segmentEdges=None):
+		if not pointKey(points[0]) == pointKey(points[-1]):
+			points = points + [points[0]]
+			if segmentEdges is not None:
+				segmentEdges = segmentEdges + [segmentEdges[-1]]
+
+		self.z = z
+		self.loopEdges = loopEdges
+		self.segmentEdges = segmentEdges
+		self.points = numpy.array([(p.x, p.y) for p in points])
+		self.segmentCount = len(self.points) - 1
+		self.minXY = self.points.min(axis=0)
+		extent = self.points.max(axis=0) - self.minXY
+		cellsPerSide = max(1, int(math.sqrt(self.segmentCount)))
+		self.cellSize = max(extent.max() / cellsPerSide, 1e-6)
+		self.cellCount = (extent // self.cellSize).astype(int) + 1
+
+		## index every segment in each cell its bounding box covers
+		self.grid = {}
+		for i in range(self.segmentCount):
+			segPoints = self.points[i:i + 2]
+			low = self.getCell(segPoints.min(axis=0))
+			high = self.getCell(segPoints.max(axis=0))
+			for cx in range(low[0], high[0] + 1):
+				for cy in range(low[1], high[1] + 1):
+					self.grid.setdefault((cx, cy), []).append(i)
+
+	@classmethod
+	def fromShape(cls, stockShape, z):
+		''' slice the stock at z, returns None when the stock has no cross section at that height '''
+		wires = stockShape.slice(FreeCAD.Vector(0, 0, 1), z)
+		if not wires:
+			return None
+
+		outerWire = max(wires, key=lambda w: w.BoundBox.DiagonalLength)
+		edges = outerWire.OrderedEdges
+
+		## orient the section edges along the loop and discretize each one, remembering the edge of every segment
+		loopEdges = []
+		points = []
+		segmentEdges = []
+		end = None
+		for k, edge in enumerate(edges):
+			first = edge.Vertexes[0].Point
+			last = edge.Vertexes[-1].Point
+			if end is None:
+				nextPoints = [v.Point for v in edges[(k + 1) % len(edges)].Vertexes]
+				reverse = len(edges) > 1 and not any(pointKey(last) == pointKey(pnt) for pnt in nextPoints)
+			else:
+				reverse = not pointKey(first) == pointKey(end)
+			end = first if reverse else last
+			loopEdges.append((edge, reverse))
+
+			edgePoints = edge.discretize(Deflection=0.01)
+			if reverse:
+				edgePoints.reverse()
+			if points:
+				edgePoints = edgePoints[1:]
+			points.extend(edgePoints)
+			segmentEdges.extend([k] * (len(edgePoints) - (0 if len(segmentEdges) else 1)))
+
+		if len(points) < 3:
+			return None
+
+		return cls(points, z, loopEdges, segmentEdges)
+
+	def getCell(self, xy):
+		cell = ((numpy.asarray(xy) - self.minXY) // self.cellSize).astype(int)
+		return (int(min(max(cell[0], 0), self.cellCount[0] - 1)), int(min(max(cell[1], 0), self.cellCount[1] - 1)))
+
+	def intersectSegment(self, i, origin, direction):
+		''' return the distance along the ray to segment i, None when the ray misses it '''
+		a = self.points[i]
+		seg = self.points[i + 1] - a
+		denom = direction[0] * seg[1] - direction[1] * seg[0]
+		if abs(denom) < 1e-12:
+			return None
+
+		rel = a - origin
+		dist = (rel[0] * seg[1] - rel[1] * seg[0]) / denom
+		along = (rel[0] * direction[1] - rel[1] * direction[0]) / denom
+		if dist <= 1e-7 or along < -1e-9 or along > 1 + 1e-9:
+			return None
+
+		return dist
+
+	def intersectRay(self, origin, direction):
+		''' return [(segment index, point)] for the nearest silhouette segment hit by the ray, the grid cells are walked along the ray '''
+		profiler.count('stockRayCasts')
+		rayStart = numpy.array([origin.x, origin.y])
+		rayDir = numpy.array([direction.x, direction.y])
+		length = numpy.linalg.norm(rayDir)
+		if length < 1e-12:
+			return []
+		rayDir = rayDir / length
+
+		cell = list(self.getCell(rayStart))
+		step = [1 if d > 0 else -1 for d in rayDir]
+		local = rayStart - self.minXY
+		nextBoundary = []
+		boundaryStep = []
+		for axis in range(2):
+			if abs(rayDir[axis]) < 1e-12:
+				nextBoundary.append(math.inf)
+				boundaryStep.append(math.inf)
+			else:
+				edge = (cell[axis] + (1 if step[axis] > 0 else 0)) * self.cellSize
+				nextBoundary.append((edge - local[axis]) / rayDir[axis])
+				boundaryStep.append(self.cellSize / abs(rayDir[axis]))
+
+		best = None
+		tested = set()
+		while 0 <= cell[0] < self.cellCount[0] and 0 <= cell[1] < self.cellCount[1]:
+			for i in self.grid.get(tuple(cell), []):
+				if i in tested:
+					continue
+				tested.add(i)
+				dist = self.intersectSegment(i, rayStart, rayDir)
+				if dist is not None and (best is None or dist < best[0]):
+					best = (dist, i)
+
+			## a hit before the far side of this cell cannot be beaten by a later cell
+			axis = 0 if nextBoundary[0] < nextBoundary[1] else 1
+			if best is not None and best[0] <= nextBoundary[axis]:
+				break
+			cell[axis] += step[axis]
+			nextBoundary[axis] += boundaryStep[axis]
+
+		if best is None:
+			return []
+
+		dist, i = best
+		hit = rayStart + dist * rayDir
+		hitPnt = FreeCAD.Vector(float(hit[0]), float(hit[1]), self.z)
+		if self.loopEdges is not None:
+			hitPnt = self.refineHit(i, hitPnt, FreeCAD.Vector(origin.x, origin.y, self.z), FreeCAD.Vector(rayDir[0], rayDir[1], 0))
+		return [(i, hitPnt)]
+
+	def refineHit(self, i, hitPnt, origin, direction):
+		''' move a polygon hit onto the section edge segment i was discretized from '''
+		edge = self.loopEdges[self.segmentEdges[i]][0]
+		profiler.count('intersectCC')
+		ray = Part.Line(origin, origin + direction)
+		best = None
+		for pnt in ray.intersectCC(edge.Curve):
+			pnt = FreeCAD.Vector(pnt.X, pnt.Y, self.z)
+			if pnt.sub(origin).dot(direction) <= 1e-7 or not self.onEdge(edge, pnt):
+				continue
+			if best is None or pnt.sub(hitPnt).Length < best.sub(hitPnt).Length:
+				best = pnt
+		if best is None:
+			## the ray only grazes the edge, project the polygon hit onto it
+			best = edge.valueAt(self.parameter(edge, hitPnt))
+		return best
+
+	def parameter(self, edge, pnt):
+		''' return the parameter of the point on the edge, within the edge range for periodic curves '''
+		param = edge.Curve.parameter(pnt)
+		if edge.Curve.isPeriodic():
+			period = edge.Curve.period()
+			while param < edge.FirstParameter - 1e-9:
+				param += period
+			while param > edge.LastParameter + 1e-9:
+				param -= period
+		return param
+
+	def onEdge(self, edge, pnt):
+		param = self.parameter(edge, pnt)
+		return edge.FirstParameter - 1e-9 <= param <= edge.LastParameter + 1e-9
+
+	def edgePiece(self, k, start=None, end=None, short=False):
+		''' return the part of loop edge k from start to end in loop direction, the edge end points are used for None.
+			short takes the part between the points without running across the seam of a closed edge '''
+		edge, reverse = self.loopEdges[k]
+		params = [edge.LastParameter, edge.FirstParameter] if reverse else [edge.FirstParameter, edge.LastParameter]
+		if start is not None:
+			params[0] = self.parameter(edge, start)
+		if end is not None:
+			params[1] = self.parameter(edge, end)
+
+		low, high = params[::-1] if reverse else params
+		if high < low:
+			if short or not edge.isClosed():
+				low, high = high, low
+			else:
+				## the loop runs across the seam of the closed edge
+				high += edge.Curve.period()
+		if high - low < 1e-9:
+			return None
+		if low == edge.FirstParameter and high == edge.LastParameter:
+			return edge
+		return edge.Curve.toShape(low, high)
+
+	def sectionPath(self, a, start, b, end):
+		''' return the section edges from the start point on segment a to the end point on segment b, in loop direction '''
+		ka = self.segmentEdges[a]
+		kb = self.segmentEdges[b]
+		if a == b:
+			pieces = [self.edgePiece(ka, start, end, True)]
+		elif ka == kb and (b - a) % self.segmentCount < self.segmentEdges.count(ka):
+			pieces = [self.edgePiece(ka, start, end)]
+		else:
+			count = len(self.loopEdges)
+			pieces = [self.edgePiece(ka, start)]
+			pieces.extend(self.edgePiece((ka + 1 + k) % count) for k in range((kb - ka - 1) % count))
+			pieces.append(self.edgePiece(kb, None, end))
+		return [piece for piece in pieces if piece is not None]
+
+	def closingEdges(self, hitSegments, hitPoints, offsetDir):
+		''' return the edges along the silhouette joining the two hit points on the side the offset direction points to '''
+		a, b = hitSegments
+		if a == b:
+			if self.loopEdges is not None:
+				return self.sectionPath(a, hitPoints[0], b, hitPoints[1])
+			return [Part.Edge(Part.LineSegment(hitPoints[0], hitPoints[1]))]
+
+		count = self.segmentCount
+		forward = [(a + 1 + k) % count for k in range((b - a) % count)]
+		backward = [(a - k) % count for k in range((a - b) % count)]
+
+		mid = numpy.array([(hitPoints[0].x + hitPoints[1].x) * 0.5, (hitPoints[0].y + hitPoints[1].y) * 0.5])
+		direction = numpy.array([offsetDir.x, offsetDir.y])
+		def score(chain):
+			return numpy.dot(self.points[chain].mean(axis=0) - mid, direction)
+
+		chain = forward if score(forward) >= score(backward) else backward
+		if self.loopEdges is not None:
+			if chain is forward:
+				return self.sectionPath(a, hitPoints[0], b, hitPoints[1])
+			return self.sectionPath(b, hitPoints[1], a, hitPoints[0])
+
+		chainPoints = [hitPoints[0]] + [FreeCAD.Vector(float(self.points[k][0]), float(self.points[k][1]), self.z) for k in chain] + [hitPoints[1]]
+
+		edges = []
+		for p1, p2 in zip(chainPoints, chainPoints[1:]):
+			if not pointKey(p1) == pointKey(p2):
+				edges.append(Part.Edge(Part.LineSegment(p1, p2)))
+		return edges
+
+	def getEdges(self):
+		''' return the silhouette as a list of edges '''
+		if self.loopEdges is not None:
+			return [edge for edge, reverse in self.loopEdges]
+		points = [FreeCAD.Vector(float(x), float(y), self.z) for x, y in self.points]
+		return [Part.Edge(Part.LineSegment(p1, p2)) for p1, p2 in zip(points, points[1:]) if not pointKey(p1) == pointKey(p2)]
+
+## silhouettes by (stock name, z height), each stored with the stock shape it was sliced from
+stockSilhouettes = collections.OrderedDict()
+stockSilhouettesSize = 32
+
+def getStockSilhouette(stockShape, z, stockName=None):
+	''' return the cached stock silhouette at z, slicing the stock again only when its shape changes '''
+	key = (stockName, round(z, 6))
+	cached = stockSilhouettes.get(key)
+	if cached is not None and cached[0].isSame(stockShape):
+		return cached[1]
+
+	with profiler.stage('stockSlice'):
+		silhouette = StockSilhouette.fromShape(stockShape, z)
+	stockSilhouettes[key] = (stockShape, silhouette)
+	if len(stockSilhouettes) > stockSilhouettesSize:
+		stockSilhouettes.popitem(last=False)
+	return silhouette
+
+def lineSegments(edges):
+	''' pack straight edges lying in one horizontal plane into an (n, 2, 2) array of their 2D end points.
+		returns (segments, z), or (None, None) when an edge is curved or the edges are not in a single plane '''
+	segments = numpy.empty((len(edges), 2, 2))
+	z = None
+	for i, edge in enumerate(edges):
+		if type(edge.Curve) not in (Part.Line, Part.LineSegment):
+			return None, None
+
+		start = edge.firstVertex().Point
+		end = edge.lastVertex().Point
+		if z is None:
+			z = start.z
+		if abs(start.z - z) > 1e-6 or abs(end.z - z) > 1e-6:
+			return None, None
+		segments[i] = ((start.x, start.y), (end.x, end.y))
+
+	return segments, z
+
+def chainSegments(segments):
+	''' order the segments of an (n, 2, 2) array into a single chain by their shared end points.
+		returns a list of (segment index, reversed) pairs and the keys of the chain ends, which is empty for a closed loop.
+		returns None when the segments branch or do not form a single chain '''
+	keys = [tuple(map(tuple, row)) for row in numpy.round(segments, 5)]
+	ends = {}
+	for i, (startKey, endKey) in enumerate(keys):
+		ends.setdefault(startKey, []).append((i, 0))
+		ends.setdefault(endKey, []).append((i, 1))
+
+	if any(len(items) > 2 for items in ends.values()):
+		return None
+
+	chainEnds = [key for key, items in ends.items() if len(items) == 1]
+	if len(chainEnds) not in (0, 2):
+		return None
+
+	## start from a chain end, or from the first segment of a loop
+	if chainEnds:
+		index, end = ends[chainEnds[0]][0]
+	else:
+		index, end = 0, 0
+
+	order = []
+	visited = set()
+	while index not in visited:
+		visited.add(index)
+		order.append((index, end == 1))
+		exitKey = keys[index][1 - end]
+		following = [item for item in ends[exitKey] if item[0] != index]
+		if not following:
+			break
+		index, end = following[0]
+
+	if len(order) != len(keys):
+		return None
+
+	return order, chainEnds
+
+def isInsidePolygon(polygon, points):
+	''' even-odd test of the (m, 2) points against the closed (n, 2) polygon, returns a boolean array '''
+	starts = polygon
+	ends = numpy.roll(polygon, -1, axis=0)
+	px = points[:, 0][:, None]
+	py = points[:, 1][:, None]
+	crosses = (starts[:, 1] > py) != (ends[:, 1] > py)
+	rise = ends[:, 1] - starts[:, 1]
+	crossX = starts[:, 0] + (py - starts[:, 1]) * (ends[:, 0] - starts[:, 0]) / numpy.where(rise == 0, 1, rise)
+	return (crosses & (px < crossX)).sum(axis=1) % 2 == 1
+
+class LineLoop:
+	''' closed loop of straight edges in a horizontal plane, held as packed 2D vertex coordinates.
+		vertex i is the start of loop edge i, edgeIndexes maps each loop edge to its index in the source edges '''
+	def __init__(self, points, z, edgeIndexes):
+		self.points = points
+		self.z = z
+		self.edgeIndexes = edgeIndexes
+
+	@classmethod
+	def fromEdges(cls, edges):
+		''' return the loop of the edges, or None when they are not straight, planar and closed '''
+		segments, z = lineSegments(edges)
+		if segments is None or len(segments) < 3:
+			return None
+
+		chain = chainSegments(segments)
+		if chain is None or chain[1]:
+			return None
+
+		order = chain[0]
+		points = numpy.array([segments[i, 1 if reverse else 0] for i, reverse in order])
+		return cls(points, z, [i for i, reverse in order])
+
+	def signedArea(self):
+		''' return the area of the loop, positive when it runs anticlockwise '''
+		x = self.points[:, 0]
+		y = self.points[:, 1]
+		return 0.5 * numpy.sum(x * numpy.roll(y, -1) - numpy.roll(x, -1) * y)
+
+	def offset(self, distances):
+		''' return the vertices with each edge moved outwards by its distance, indexed by loop edge.
+			each vertex moves to the intersection of its two offset edges, or by the sum of their offsets when they are parallel '''
+		directions = numpy.roll(self.points, -1, axis=0) - self.points
+		## the outside of an anticlockwise loop is on the right of its edges
+		normals = -perpendicularRows(normalizeRows(directions))
+		if self.signedArea() < 0:
+			normals = -normals
+
+		shifts = normals * distances[:, None]
+		## vertex i joins the previous edge to edge i
+		prevShifts = numpy.roll(shifts, 1, axis=0)
+		prevDirections = numpy.roll(directions, 1, axis=0)
+		prevPoints = self.points + prevShifts
+		points = self.points + shifts
+
+		def cross(a, b):
+			return a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+
+		denom = cross(prevDirections, directions)
+		solvable = numpy.abs(denom) > 1e-9 * numpy.linalg.norm(prevDirections, axis=1) * numpy.linalg.norm(directions, axis=1)
+		safeDenom = numpy.where(solvable, denom, 1)
+		along = cross(points - prevPoints, directions) / safeDenom
+		meet = prevPoints + along[:, None] * prevDirections
+		## parallel edges are offset together, take the larger offset
+		larger = numpy.linalg.norm(shifts, axis=1) >= numpy.linalg.norm(prevShifts, axis=1)
+		parallel = self.points + numpy.where(larger[:, None], shifts, prevShifts)
+		return numpy.where(solvable[:, None], meet, parallel)
+
+	def toFace(self, points=None):
+		''' build the face of the loop, or of the supplied vertices '''
+		if points is None:
+			points = self.points
+		vectors = [FreeCAD.Vector(float(x), float(y), self.z) for x, y in points]
+		profiler.count('faceBuilds')
+		with profiler.stage('faceMaker'):
+			return Part.Face(Part.makePolygon(vectors + vectors[:1]))
+
+def faceEdgeKey(edge):
+	''' key of an edge from its end points and mid point, the same for the coincident edges of neighbouring faces in either direction '''
+	k1 = pointKey(edge.Vertexes[0].Point)
+	k2 = pointKey(edge.Vertexes[-1].Point)
+	midPnt = edge.valueAt(edge.FirstParameter + 0.5 * (edge.LastParameter - edge.FirstParameter))
+	return (min(k1, k2), max(k1, k2), pointKey(midPnt))
+
+def getOuterEdges(shape, faceNames):
+	''' return the outer wire edges of the named faces with the edges shared by two of the faces removed,
+		which is the outline of the merged faces in wire order '''
+	if len(faceNames) == 1:
+		return shape.getElement(faceNames[0]).OuterWire.Edges
+
+	edgeIndex = collections.OrderedDict()
+	for faceName in faceNames:
+		for edge in shape.getElement(faceName).OuterWire.Edges:
+			edgeIndex.setdefault(faceEdgeKey(edge), []).append(edge)
+	## the remaining edges are in face order, put them back in wire order
+	return Part.__sortEdges__([edges[0] for edges in edgeIndex.values() if len(edges) == 1])
+
+def groupAdjacentFaces(shape, faceNames):
+	''' split the face names into groups of faces connected by shared edges, in the order of faceNames '''
+	edgeFaces = {}
+	for faceName in faceNames:
+		for edge in shape.getElement(faceName).OuterWire.Edges:
+			edgeFaces.setdefault(faceEdgeKey(edge), []).append(faceName)
+
+	## join the groups of the faces sharing each edge
+	parents = {faceName: faceName for faceName in faceNames}
+	def find(faceName):
+		while parents[faceName] != faceName:
+			parents[faceName] = parents[parents[faceName]]
+			faceName = parents[faceName]
+		return faceName
+
+	for sharedFaces in edgeFaces.values():
+		for faceName in sharedFaces[1:]:
+			parents[find(faceName)] = find(sharedFaces[0])
+
+	groups = collections.OrderedDict()
+	for faceName in faceNames:
+		groups.setdefault(find(faceName), []).append(faceName)
+	return list(groups.values())
+
+def isLevelFace(face):
+	''' check if the face is planar and faces straight up '''
+	if not Part.Plane == type(face.Surface):
+		return False
+
+	u0, u1, v0, v1 = face.ParameterRange
+	normal = face.normalAt(0.5 * (u0 + u1), 0.5 * (v0 + v1))
+	return normal.z >= 1 - 1e-6
+
+class LevelTable:
+	''' upward facing planar faces of a shape sorted by height, coplanar faces share a level '''
+	def __init__(self, shape):
+		faceNames = []
+		heights = []
+		for i, face in enumerate(shape.Faces):
+			if not isLevelFace(face):
+				continue
+
+			faceNames.append('Face{}'.format(i + 1))
+			heights.append(face.BoundBox.ZMax)
+
+		order = numpy.argsort(heights, kind='stable')
+		self.heights = numpy.array(heights)[order]
+		self.faceNames = [faceNames[i] for i in order]
+
+	def levels(self, precision=5):
+		''' return the (height, face names) of each group of coplanar faces, lowest first '''
+		groups = collections.OrderedDict()
+		for z, faceName in zip(numpy.round(self.heights, precision), self.faceNames):
+			groups.setdefault(float(z), []).append(faceName)
+		return list(groups.items())
+
+## level tables and open face names by shape, each built once per shape
+_levelTables = ShapeCache()
+_openFaces = ShapeCache()
+
+def getLevelTable(shape):
+	''' return the level table of the shape '''
+	table = _levelTables.get(shape)
+	if table is None:
+		with profiler.stage('faceScan'):
+			table = LevelTable(shape)
+		_levelTables.set(shape, table)
+	return table
+
+def isOpenFace(shape, faceName, classifier):
+	''' check if any edge of the outer wire of the face is extendable, i.e. not bounded by a wall of the shape '''
+	table = EdgeTable(shape.getElement(faceName).OuterWire.Edges)
+	return bool(table.classify(classifier).any())
+
+def getOpenFaces(shape, owner=None):
+	''' return the names of the upward facing planar faces of the shape with an open boundary, lowest level first '''
+	faceNames = _openFaces.get(shape)
+	if faceNames is None:
+		classifier = EdgeClassifier(shape, owner)
+		faceNames = []
+		with profiler.stage('faceClassification'):
+			for z, levelFaces in getLevelTable(shape).levels():
+				faceNames.extend(faceName for faceName in levelFaces if isOpenFace(shape, faceName, classifier))
+		_openFaces.set(shape, faceNames)
+	return faceNames
+
+class HelperEdgeManager:
+	def __init__(self):
+		self.helperEdges = []
+
+	def showEdge(self, edges):
+		Wire = Part.Wire(edges)
+		edgeName = 'testEdge'
+		Part.show(Wire, edgeName) 
+		FreeCAD.ActiveDocument.recompute()
+
+	def getEndPoints(self):
+		points = [pnt for helperEdge in self.helperEdges for pnt in helperEdge._getEndPoints()]
+		if not points:
+			return []
+
+		### Find the two points that are not connected, the coincidence test is done on the packed points ###
+		## adding zero turns -0.0 into 0.0, the rows are compared bitwise
+		keys = numpy.round(numpy.array([(p.x, p.y, p.z) for p in points]), 5) + 0.0
+		_, inverse, counts = numpy.unique(keys, axis=0, return_inverse=True, return_counts=True)
+		return [Part.Vertex(p) for p, count in zip(points, counts[inverse.reshape(-1)]) if count == 1]
+
+
+	def getShapeEdges(self, shape, faceName, bb, owner=None, stockShape=None, stockName=None):
+		''' get the helper edges for the named face of the shape, closed against the stock.
+			faceName may be a list of adjacent coplanar faces, which are merged into one outline.
+			the stock bounding box is used unless a stock shape that does not fill its bounding box is supplied,
+			its silhouette is cached by stockName '''
+		self.helperEdges = []
+		faceNames = [faceName] if isinstance(faceName, str) else list(faceName)
+		faces = [shape.getElement(name) for name in faceNames]
+		outerEdges = getOuterEdges(shape, faceNames)
+
+		start = profiler.start()
+		classifier = EdgeClassifier(shape, owner)
+		wireEdges = outerEdges
+		table = EdgeTable(wireEdges)
+		for i in numpy.flatnonzero(~table.classify(classifier)):
+			self.helperEdges.append(HelperEdge.fromTable(table, i, classifier))
+		profiler.stop('classification', start)
+
+		###### get boundingbox edges at face z height ######
+		bbEdges=[]
+		bbz = max(face.BoundBox.ZMax for face in faces)
+		bbEdges.append(Part.Edge(Part.LineSegment(FreeCAD.Vector(bb.XMin,bb.YMin,bbz), FreeCAD.Vector(bb.XMin,bb.YMax,bbz))))
+		bbEdges.append(Part.Edge(Part.LineSegment(FreeCAD.Vector(bb.XMin,bb.YMax,bbz), FreeCAD.Vector(bb.XMax,bb.YMax,bbz))))
+		bbEdges.append(Part.Edge(Part.LineSegment(FreeCAD.Vector(bb.XMax,bb.YMax,bbz), FreeCAD.Vector(bb.XMax,bb.YMin,bbz))))
+		bbEdges.append(Part.Edge(Part.LineSegment(FreeCAD.Vector(bb.XMax,bb.YMin,bbz), FreeCAD.Vector(bb.XMin,bb.YMin,bbz))))
+
+		###### use the real stock cross section when the stock is not a box ######
+		silhouette = None
+		if stockShape is not None and not isBoxStock(stockShape, bb):
+			silhouette = getStockSilhouette(stockShape, bbz, stockName)
+
+		if not len(self.helperEdges):
+			FreeCAD.Console.PrintWarning('Open Face Selected')
+			objBBz = shape.BoundBox.ZMax
+
+			if round(bbz, 5) == round(objBBz, 5):
+				FreeCAD.Console.PrintWarning('Top face of object selected')
+				## the silhouette edges are only needed here
+				topEdges = silhouette.getEdges() if silhouette is not None else bbEdges
+				for edge in topEdges:
+					newEdge = HelperEdge(edge, classifier)
+					self.helperEdges.append(newEdge)
+			
+				# Check if the helper edges are available and return
+				if len(self.helperEdges):
+					return self.helperEdges
+			
+		###### straight edges closed against a box stock are solved on packed 2D coordinates ######
+		if silhouette is None:
+			polygonEdges = self.getPolygonEdges(bbEdges, bb, classifier)
+			if polygonEdges is not None:
+				return polygonEdges
+
+		endPoints = self.getEndPoints()
+
+		if not endPoints:
+			## No end points generated, face generation failed, return the list of helper edges and exit cleanly. 
+			return self.helperEdges
+		else:
+			## if a single fixed edge cannot be generated return all the edges from the selected face
+			if len(endPoints) > 2:
+				self.helperEdges = []
+				for edge in outerEdges:
+					newEdge = HelperEdge(edge, classifier)
+					self.helperEdges.append(newEdge)
+
+				return self.helperEdges	
+
+		## get edge edges ##
+		start = profiler.start()
+		stockIntersectPoints = []
+		bbConnEdges = []
+		tempIndex = VertexIndex()
+		for newEdge in self.helperEdges:
+			for pnt in newEdge._getEndPoints():
+				tempIndex.add(pnt, newEdge._getEdge())
+
+		for ep in endPoints:
+			for edge in tempIndex.get(ep.Point):
+				normal = self.getExtensionDirection(edge, ep.Point, classifier)
+				## extend the edge to the stock edges hit by the ray from the end point
+				if silhouette is not None:
+					hits = silhouette.intersectRay(ep.Point, normal)
+				else:
+					hits = self.intersectStock(ep.Point, normal, bbEdges, bb)
+
+				for bbedge, tempPnt in hits:
+					extEdge = Part.Edge(Part.LineSegment(ep.Point, tempPnt))
+					newEdge = HelperEdge(extEdge, classifier, True)
+					self.helperEdges.append(newEdge)
+					bbConnEdges.append(bbedge)
+					stockIntersectPoints.append(tempPnt)	
+
+		if silhouette is not None:
+			if len(bbConnEdges) == 2:
+				###### close along the stock silhouette ######
+				for edge in silhouette.closingEdges(bbConnEdges, stockIntersectPoints, self.getOffsetDirection()):
+					newEdge = HelperEdge(edge, classifier)
+					self.helperEdges.append(newEdge)
+
+		###### check if the bb edges are the same edge ######
+		elif len(bbConnEdges) == 2:
+			if bbConnEdges[0] == bbConnEdges[1]:
+				###### Create new connecting edge and add to the list of edges ######
+				closeEdge = Part.Edge(Part.LineSegment(stockIntersectPoints[0], stockIntersectPoints[1]))
+				newEdge = HelperEdge(closeEdge, classifier)
+				self.helperEdges.append(newEdge)
+			else:				
+				###### check if the bb edges are connected ######
+				bbEdgesConnected = False
+				bbIndex = VertexIndex()
+				for v2 in bbConnEdges[1].Vertexes:
+					bbIndex.add(v2.Point)
+				for v1 in bbConnEdges[0].Vertexes:
+					if bbIndex.count(v1.Point):
+						bbEdgesConnected = True
+						###### Create new edges to the stock and add to the list of edges ######
+						for pnt in stockIntersectPoints:
+							edge = Part.Edge(Part.LineSegment(pnt, v1.Point))
+							newEdge = HelperEdge(edge, classifier)
+							self.helperEdges.append(newEdge)
+
+				if not bbEdgesConnected:
+					offsetDir = self.getOffsetDirection()
+
+					closingPts = []
+					for i, pnt in enumerate(stockIntersectPoints):
+						for v in bbConnEdges[i].Vertexes:
+							vectorCompare = v.Point.sub(pnt).normalize()
+							dist = vectorCompare.sub(offsetDir).Length
+
+							#if self.isSamePoint(offsetDir, vectorCompare):
+							if dist < 0.5: #TODO: Is checking the dist robust?
+								closingPts.append(v.Point)
+								edge = Part.Edge(Part.LineSegment(pnt, v.Point))
+								newEdge = HelperEdge(edge, classifier)
+								self.helperEdges.append(newEdge)
+						
+					if len(closingPts) == 2:
+						edge = Part.Edge(Part.LineSegment(closingPts[0], closingPts[1]))
+						newEdge = HelperEdge(edge, classifier)
+						self.helperEdges.append(newEdge)
+
+		profiler.stop('stockIntersection', start)
+
+		if len(self.helperEdges):
+			self.sortEdges()
+			return self.helperEdges
+		
+		return [edge for face in faces for edge in face.Edges]
+
+	def getPolygonEdges(self, bbEdges, bb, classifier):
+		''' close an open chain of straight helper edges against the stock rectangle using packed 2D coordinates.
+			the loop is sorted with sortEdges, so it is numbered as the general path numbers it.
+			returns None when the chain is curved, branched or needs the general path to close it '''
+		if not len(self.helperEdges):
+			return None
+
+		segments, z = lineSegments([helperEdge._getEdge() for helperEdge in self.helperEdges])
+		if segments is None:
+			return None
+
+		chain = chainSegments(segments)
+		if chain is None or len(chain[1]) != 2:
+			return None
+
+		order = chain[0]
+		points = [segments[order[0][0], 1 if order[0][1] else 0]]
+		points.extend(segments[i, 0 if reverse else 1] for i, reverse in order)
+		points = numpy.array(points)
+
+		## extend the chain ends along their edges to the stock sides
+		hits = []
+		for origin, previous in ((points[-1], points[-2]), (points[0], points[1])):
+			direction = normalizeRows(numpy.array([origin - previous]))[0]
+			rayHits = self.intersectStockBounds(FreeCAD.Vector(origin[0], origin[1], z), FreeCAD.Vector(direction[0], direction[1], 0), bbEdges, bb)
+			if len(rayHits) != 1:
+				return None
+			hits.append((bbEdges.index(rayHits[0][0]), numpy.array((rayHits[0][1].x, rayHits[0][1].y))))
+
+		def segment(start, end):
+			return Part.Edge(Part.LineSegment(FreeCAD.Vector(start[0], start[1], z), FreeCAD.Vector(end[0], end[1], z)))
+
+		(endSide, endHit), (startSide, startHit) = hits
+		## the edges are added in the order the general path adds them and sorted the same way,
+		## so the edge numbers stored in CheckedEdges do not depend on the path taken
+		endPoints = self.getEndPoints()
+		if len(endPoints) != 2:
+			return None
+
+		chainEnds = []
+		extEdges = []
+		for ep in endPoints:
+			pnt = numpy.array((ep.Point.x, ep.Point.y))
+			atEnd = numpy.linalg.norm(pnt - points[-1]) <= numpy.linalg.norm(pnt - points[0])
+			chainEnds.append(atEnd)
+			hit = endHit if atEnd else startHit
+			extEdges.append(HelperEdge(segment(pnt, hit), classifier, True))
+		if chainEnds[0] == chainEnds[1]:
+			return None
+		chainEdges = self.helperEdges
+		self.helperEdges = chainEdges + extEdges
+
+		## walk the stock rectangle from the end hit to the start hit, the corner after each side in build order
+		corners = numpy.array(((bb.XMin, bb.YMax), (bb.XMax, bb.YMax), (bb.XMax, bb.YMin), (bb.XMin, bb.YMin)))
+		walk = []
+		if endSide != startSide:
+			forward = [corners[(endSide + k) % 4] for k in range((startSide - endSide) % 4)]
+			backward = [corners[(endSide - 1 - k) % 4] for k in range((endSide - startSide) % 4)]
+			if len(forward) != len(backward):
+				walk = min(forward, backward, key=len)
+			else:
+				## opposite sides, close towards the open side of the face
+				offsetDir = self.getOffsetDirection()
+				offset = numpy.array((offsetDir.x, offsetDir.y))
+				def deviation(corners):
+					return numpy.linalg.norm(normalizeRows(numpy.array([corners[0] - endHit]))[0] - offset)
+				walk = min(forward, backward, key=deviation)
+				if deviation(walk) >= 0.5:
+					self.helperEdges = chainEdges
+					return None
+
+		closeEdges = []
+		if not walk:
+			hit0, hit1 = (endHit, startHit) if chainEnds[0] else (startHit, endHit)
+			closeEdges.append(HelperEdge(segment(hit0, hit1), classifier))
+		else:
+			## each hit point is joined to the corner next to it, two corners are joined to each other
+			closingPts = [walk[0] if atEnd else walk[-1] for atEnd in chainEnds]
+			for atEnd, corner in zip(chainEnds, closingPts):
+				closeEdges.append(HelperEdge(segment(endHit if atEnd else startHit, corner), classifier))
+			if len(walk) == 2:
+				closeEdges.append(HelperEdge(segment(closingPts[0], closingPts[1]), classifier))
+
+		profiler.count('polygonBoundaries')
+		self.helperEdges = self.helperEdges + closeEdges
+		self.sortEdges()
+		return self.helperEdges
+
+	def getOffsetDirection(self):
+		''' return the mean direction of the helper edge normals, pointing towards the open side of the face '''
+		edgeNormals = numpy.array([helperEdge._getPerpNormal() for helperEdge in self.helperEdges])
+		return toVector(edgeNormals.sum(axis=0)).normalize()
+
+	def getExtensionDirection(self, edge, endPoint, classifier):
+		''' return the unit direction to extend the edge beyond the end point '''
+		if Part.Circle == type(edge.Curve):
+			## get the direction of the end points
+			tangent = edge.tangentAt(edge.FirstParameter).negative()
+			if self.isSamePoint(endPoint, edge.lastVertex().Point):
+				tangent = edge.tangentAt(edge.LastParameter)
+			normal = tangent
+			testPoint = endPoint + 0.01 * tangent
+
+			## if the test point is inside the model take the normal from the circle centre to the end point.
+			if classifier.isInside(testPoint, True):
+				normal = endPoint.sub(edge.Curve.Location).normalize()
+
+			return normal
+
+		## otherwise continue along the edge chord
+		normal = edge.lastVertex().Point.sub(edge.firstVertex().Point)
+		if self.isSamePoint(endPoint, edge.firstVertex().Point):
+			normal = edge.firstVertex().Point.sub(edge.lastVertex().Point)
+
+		return normal.normalize()
+
+	def intersectStock(self, origin, direction, stockEdges, bb=None):
+		''' return the (stock edge, point) pairs where the ray from origin along direction hits the stock edges.
+			bb is the axis aligned stock rectangle the stock edges were built from, the hits are solved directly when it is supplied '''
+		if bb is not None and abs(direction.z) < 1e-9:
+			return self.intersectStockBounds(origin, direction, stockEdges, bb)
+
+		hits = []
+		ray = Part.Line(origin, origin + direction)
+		for stockEdge in stockEdges:
+			profiler.count('intersectCC')
+			for pnt in ray.intersectCC(stockEdge.Curve):
+				hitPnt = FreeCAD.Vector(pnt.X, pnt.Y, pnt.Z)
+				posOnEdge = stockEdge.Curve.parameter(hitPnt)
+				if posOnEdge < stockEdge.FirstParameter or posOnEdge > stockEdge.LastParameter:
+					continue
+
+				offset = hitPnt.sub(origin)
+				if offset.Length > 1e-7 and offset.normalize().sub(direction).Length < 0.01:
+					hits.append((stockEdge, hitPnt))
+
+		return hits
+
+	def intersectStockBounds(self, origin, direction, stockEdges, bb):
+		''' ray intersection with the stock rectangle edges, ordered XMin, YMax, XMax, YMin as built in getShapeEdges '''
+		profiler.count('stockRayCasts')
+		sides = ((0, bb.XMin), (1, bb.YMax), (0, bb.XMax), (1, bb.YMin))
+		limits = ((bb.YMin, bb.YMax), (bb.XMin, bb.XMax))
+		rayStart = (origin.x, origin.y)
+		rayDir = (direction.x, direction.y)
+
+		hits = []
+		for stockEdge, (axis, value) in zip(stockEdges, sides):
+			if abs(rayDir[axis]) < 1e-12:
+				## ray is parallel to the side
+				continue
+
+			dist = (value - rayStart[axis]) / rayDir[axis]
+			if dist <= 1e-7:
+				continue
+
+			other = rayStart[1 - axis] + dist * rayDir[1 - axis]
+			low, high = limits[axis]
+			if other < low - 1e-7 or other > high + 1e-7:
+				continue
+
+			hitPnt = [0.0, 0.0]
+			hitPnt[axis] = value
+			hitPnt[1 - axis] = other
+			hits.append((stockEdge, FreeCAD.Vector(hitPnt[0], hitPnt[1], stockEdge.Vertexes[0].Point.z)))
+
+		return hits
+
+	def sortEdges(self):
+		''' sort the helper edges into a continous loop '''
+		fcEdges = []
+		for helperEdge in self.helperEdges:
+			edge = helperEdge._getEdge()
+			fcEdges.append(edge)
+
+		with profiler.stage('sortEdges'):
+			sortedEdges = Part.__sortEdges__(fcEdges)
+		sortedHelperEdges = []
+
+		## index the helper edges by their end points, independent of edge direction
+		edgeIndex = {}
+		for helperEdge in self.helperEdges:
+			endPoints = helperEdge._getEndPoints()
+			edgeKey = self.pointsKey(endPoints[0], endPoints[-1])
+			edgeIndex.setdefault(edgeKey, []).append(helperEdge)
+
+		for edge in sortedEdges:
+			sortedHelperEdges.extend(edgeIndex.get(self.edgeKey(edge), []))
+
+		self.helperEdges = sortedHelperEdges
+
+	def edgeKey(self, edge):
+		''' return a key for the edge end points that is the same in either direction '''
+		return self.pointsKey(edge.firstVertex().Point, edge.lastVertex().Point)
+
+	def pointsKey(self, pnt1, pnt2):
+		k1 = pointKey(pnt1)
+		k2 = pointKey(pnt2)
+		return (min(k1, k2), max(k1, k2))
+
+	def buildFace(self, edges, checkedEdges, extendDist=0, edgeDistances=None, showFailed=True):
+		''' build the helper face from the boundary edges and extend the checked edges.
+			straight edges in a single plane are offset as a packed 2D loop, curved edges use extendFace.
+			either way the face is built once '''
+		loop = LineLoop.fromEdges(edges)
+		if loop is None:
+			return self.extendFace(edges, checkedEdges, extendDist, edgeDistances, showFailed)
+
+		profiler.count('polygonFaces')
+		edgeDistances = edgeDistances or {}
+		checked = set(int(e) for e in checkedEdges)
+		distances = numpy.array([edgeDistances.get(i + 1, extendDist) if i + 1 in checked else 0.0 for i in loop.edgeIndexes])
+		with profiler.stage('extendFace'):
+			points = loop.offset(distances) if distances.any() else loop.points
+		return loop.toFace(points)
+
+	def createFace(self, edges, showFailed=True):
+		''' create a new face using from the supplied edges, the open wire is added to the document when showFailed is set'''
+		finalWire = Part.Wire(edges)
+		if not finalWire.isClosed():
+			FreeCAD.Console.PrintError('Face Creation failed - wire not closed')
+			if showFailed:
+				self.showEdge(edges)
+			return None
+		else:		
+			profiler.count('faceBuilds')
+			with profiler.stage('faceMaker'):
+				nface = Part.Face(finalWire, "Part::FaceMakerBullseye")
+	
+		return nface
+
+	def isSamePoint(self, pt1, pt2):
+		''' Checks if two points share the same coordinates '''
+		return pointKey(pt1) == pointKey(pt2)
+
+	def extendFace(self, edges, checkedEdges, extendDist=0, edgeDistances=None, showFailed=True):
+		''' extend the selected edges and build the face, edgeDistances maps edge numbers to a distance used in place of extendDist '''
+		with profiler.stage('extendFace'):
+			return self._extendFace(edges, checkedEdges, extendDist, edgeDistances or {}, showFailed)
+
+	def _extendFace(self, edges, checkedEdges, extendDist, edgeDistances, showFailed):
+		''' offset the checked edges outwards in a single pass.
+			lines are moved along their normal and arcs keep their centre and grow or shrink their radius.
+			each moved vertex is placed where the offset edges meet, solved for all the vertices together.
+			the outside of each edge is found against the boundary outline so the face is only built once, at the end '''
+		newEdges = list(edges)
+		checked = sorted(set(int(e) - 1 for e in checkedEdges if 0 < int(e) <= len(edges)))
+		distances = {i: edgeDistances.get(i + 1, extendDist) for i in checked}
+		checked = [i for i in checked if distances[i]]
+
+		if len(checked):
+			table = EdgeTable([edges[i] for i in checked])
+			chordNormals = table.chordNormals()
+
+			## direction from the mid point of each checked edge, radial for arcs and the chord normal for lines
+			directions = []
+			for row, i in enumerate(checked):
+				edge = edges[i]
+				midPnt = toVector(table.midpoints[row])
+				if Part.Circle == type(edge.Curve):
+					directions.append(self.radial(edge.Curve.Center, midPnt))
+				else:
+					directions.append(toVector(chordNormals[row]))
+
+			## classify a point just off every checked edge against the outline in one pass
+			testPoints = numpy.array([(mid[0] + 0.01 * d.x, mid[1] + 0.01 * d.y) for mid, d in zip(table.midpoints, directions)])
+			outline = self.getOutline(edges)
+			if outline is None:
+				inside = numpy.zeros(len(checked), dtype=bool)
+			else:
+				inside = isInsidePolygon(outline, testPoints)
+
+			## outward offset of each end of the checked edges, keyed by (edge index, vertex index)
+			endShifts = {}
+			midShifts = {}
+			for row, i in enumerate(checked):
+				edge = edges[i]
+				dist = distances[i]
+				if Part.Circle == type(edge.Curve):
+					## the arc grows when the outside of the face is away from the centre
+					centre = edge.Curve.Center
+					sign = -1 if inside[row] else 1
+					for j, v in enumerate(edge.Vertexes):
+						endShifts[(i, j)] = self.radial(centre, v.Point) * (sign * dist)
+					midShifts[i] = directions[row] * (sign * dist)
+				else:
+					normal = directions[row]
+					if inside[row]:
+						normal = normal.negative()
+					for j, v in enumerate(edge.Vertexes):
+						endShifts[(i, j)] = normal * dist
+
+			vertexIndex = VertexIndex()
+			for i, edge in enumerate(edges):
+				for j, v in enumerate(edge.Vertexes):
+					vertexIndex.add(v.Point, (i, j))
+
+			vertexPoints = self.solveVertices(edges, endShifts, vertexIndex)
+
+			for i, edge in enumerate(edges):
+				points = [v.Point for v in edge.Vertexes]
+				moved = [vertexPoints.get(pointKey(p)) for p in points]
+				if i not in midShifts and all(p is None for p in moved):
+					continue
+
+				newPoints = [p if newPnt is None else newPnt for p, newPnt in zip(points, moved)]
+				newEdges[i] = self.rebuildEdge(edge, newPoints, midShifts.get(i))
+
+		newFace = self.createFace(newEdges, showFailed)
+		if not newFace:
+			FreeCAD.Console.PrintError('Face Extension Failed')
+		else:
+			return newFace
+
+	def solveVertices(self, edges, endShifts, vertexIndex):
+		''' return the new position of every vertex touched by a shifted edge end, by vertex key.
+			a vertex joining two edges moves to the intersection of the two edges offset along their end tangents,
+			so an unshifted neighbour is extended along its own direction. the intersections are solved as one batch '''
+		vertexPoints = {}
+		pairs = []
+		for (i, j), shift in endShifts.items():
+			pnt = edges[i].Vertexes[j].Point
+			key = pointKey(pnt)
+			if key in vertexPoints:
+				continue
+
+			ends = vertexIndex.get(pnt)
+			## sum the shifts where the vertex does not join exactly two edges
+			total = FreeCAD.Vector()
+			for end in ends:
+				if end in endShifts:
+					total = total.add(endShifts[end])
+			vertexPoints[key] = pnt.add(total)
+
+			if len(ends) == 2:
+				pairs.append((key, pnt, ends))
+
+		if not pairs:
+			return vertexPoints
+
+		## offset line of each edge end meeting at the vertex, as point and tangent
+		count = len(pairs)
+		linePoints = numpy.empty((2, count, 2))
+		lineDirs = numpy.empty((2, count, 2))
+		for row, (key, pnt, ends) in enumerate(pairs):
+			for side, (i, j) in enumerate(ends):
+				edge = edges[i]
+				param = edge.FirstParameter if j == 0 else edge.LastParameter
+				tangent = edge.tangentAt(param)
+				shift = endShifts.get((i, j), FreeCAD.Vector())
+				linePoints[side, row] = (pnt.x + shift.x, pnt.y + shift.y)
+				lineDirs[side, row] = (tangent.x, tangent.y)
+
+		## solve pointA + s * dirA = pointB + u * dirB for every vertex
+		def cross(a, b):
+			return a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+
+		denom = cross(lineDirs[0], lineDirs[1])
+		solvable = numpy.abs(denom) > 1e-9
+		safeDenom = numpy.where(solvable, denom, 1)
+		along = cross(linePoints[1] - linePoints[0], lineDirs[1]) / safeDenom
+		meet = linePoints[0] + along[:, None] * lineDirs[0]
+
+		for row, (key, pnt, ends) in enumerate(pairs):
+			if solvable[row]:
+				vertexPoints[key] = FreeCAD.Vector(float(meet[row, 0]), float(meet[row, 1]), pnt.z)
+			else:
+				## parallel edges are offset together, take the larger offset
+				shifts = [endShifts.get(end, FreeCAD.Vector()) for end in ends]
+				vertexPoints[key] = pnt.add(max(shifts, key=lambda shift: shift.Length))
+
+		return vertexPoints
+
+	def radial(self, centre, pnt):
+		''' return the unit direction from the centre to the point in the xy plane '''
+		vec = pnt.sub(centre)
+		vec.z = 0
+		return vec.normalize()
+
+	def getOutline(self, edges):
+		''' return the boundary loop as an (n, 2) polygon, fine enough to classify points close to the edges.
+			returns None when the edges do not form a wire '''
+		try:
+			points = Part.Wire(edges).discretize(Deflection=0.001)
+		except Part.OCCError:
+			return None
+		return numpy.array([(p.x, p.y) for p in points])
+
+	def rebuildEdge(self, edge, points, midShift=None):
+		''' rebuild the edge between the moved end points, arcs pass through their shifted mid point '''
+		if len(points) < 2:
+			return edge
+
+		if Part.Circle == type(edge.Curve):
+			midPnt = edge.valueAt(edge.FirstParameter + 0.5 * (edge.LastParameter - edge.FirstParameter))
+			if midShift is not None:
+				midPnt = midPnt.add(midShift)
+			try:
+				return Part.Edge(Part.Arc(points[0], midPnt, points[1]))
+			except Part.OCCError:
+				## the points are collinear, continue with a straight edge
+				pass
+
+		return Part.Edge(Part.LineSegment(points[0], points[1]))
+
+def computeBoundaries(task):
+	''' process pool worker, compute the boundaries for a list of faces of a BREP serialised shape.
+		returns a list of (faceName, edges brep, extendable edges), the brep is None when generation fails '''
+	brep, faceNames, stockBounds, stockBrep = task
+	shape = Part.Shape()
+	shape.importBrepFromString(brep)
+	stockShape = Part.Shape()
+	stockShape.importBrepFromString(stockBrep)
+	bb = FreeCAD.BoundBox(*stockBounds)
+	edgeManager = HelperEdgeManager()
+
+	results = []
+	for faceName in faceNames:
+		## a failing face must not fail the rest of the chunk
+		try:
+			helperEdges = edgeManager.getShapeEdges(shape, faceName, bb, None, stockShape)
+			if len(helperEdges) < 3:
+				results.append((faceName, None, []))
+				continue
+
+			extendableEdges = [idx + 1 for idx, helperEdge in enumerate(helperEdges) if helperEdge._isExtendable()]
+			edges = Part.Compound([helperEdge._getEdge() for helperEdge in helperEdges])
+			results.append((faceName, edges.exportBrepToString(), extendableEdges))
+		except Exception as e:
+			FreeCAD.Console.PrintError('{}: {}\n'.format(faceName, e))
+			results.append((faceName, None, []))
+
+	return results
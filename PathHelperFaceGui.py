@@ -27,8 +27,7 @@ import os, math
 
 from PySide import QtGui, QtCore
 from PySide.QtGui import QTreeWidgetItem
-
-import PathScripts.PathUtils as PathUtils
+from pivy import coin
 
 import PathHelperFace
 
@@ -36,31 +35,86 @@ dir = os.path.dirname(__file__)
 ui_name = "PathHelperFaceGui.ui"
 path_to_ui = dir + "/" +ui_name
 
+## the form class is generated from the ui file once and reused by every panel
+formClass = None
+
+def getFormClass():
+	global formClass
+	if formClass is None:
+		formClass = FreeCADGui.PySideUic.loadUiType(path_to_ui)
+	return formClass
+
+## delay after the last edit before the preview is computed, in milliseconds
+previewDelay = 300
+
+class PreviewSignals(QtCore.QObject):
+	''' signals of a preview job, emitted from the worker thread and delivered on the gui thread '''
+	finished = QtCore.Signal(int, object)
+
+class PreviewJob(QtCore.QRunnable):
+	''' extend a copy of the cached boundary away from the gui thread '''
+	def __init__(self, generation, edges, checkedEdges, extendDist, edgeDistances):
+		super(PreviewJob, self).__init__()
+		self.generation = generation
+		self.edges = edges
+		self.checkedEdges = checkedEdges
+		self.extendDist = extendDist
+		self.edgeDistances = edgeDistances
+		self.signals = PreviewSignals()
+
+	def run(self):
+		shape = None
+		try:
+			## never add failed wires to the document from the worker thread
+			shape = PathHelperFace.extendBoundary(self.edges, self.checkedEdges, self.extendDist, self.edgeDistances, showFailed=False)
+		except Exception as e:
+			FreeCAD.Console.PrintLog('Helper Face preview failed: {}\n'.format(e))
+		self.signals.finished.emit(self.generation, shape)
+
 class PathHelperPanel:
 	def __init__(self, obj=None):
-		# self will create a Qt widget from the ui file
-		self.form = FreeCADGui.PySideUic.loadUi(path_to_ui)
+		# self will create a Qt widget from the cached ui form class
+		uiClass, baseClass = getFormClass()
+		self.form = baseClass()
+		self.ui = uiClass()
+		self.ui.setupUi(self.form)
 		self.tempObj = None
 		self.helperFace = None
+		self.previewReady = False
+		self.previewGeneration = 0
+		self.previewNode = None
+		self.previewSignals = []
+		self.previewTimer = QtCore.QTimer()
+		self.previewTimer.setSingleShot(True)
+		self.previewTimer.setInterval(previewDelay)
+		self.previewTimer.timeout.connect(self.startPreview)
 
        #Load UI Components
-		self.addFace_PB = self.form.addFace_PB
-		self.face_LE = self.form.face_LE
-		self.edges_TW = self.form.edges_TW
-		self.extendDist_LE = self.form.extendDist_LE
-		self.toolController_CB = self.form.toolController_CB
+		self.addFace_PB = self.ui.addFace_PB
+		self.face_LE = self.ui.face_LE
+		self.edges_TW = self.ui.edges_TW
+		self.extendDist_LE = self.ui.extendDist_LE
+		self.toolController_CB = self.ui.toolController_CB
+		self.mergeFaces_CB = self.ui.mergeFaces_CB
 
 		##setup ui
 		self.edges_TW.headerItem().setText(0, "Extendable Edges")
+		self.edges_TW.headerItem().setText(1, "Extra Distance")
+		## only the distance column is edited, from a double click
+		self.edges_TW.setEditTriggers(QtGui.QAbstractItemView.NoEditTriggers)
       
         #connect
 		self.addFace_PB.clicked.connect(self.handleSelection)
 		self.edges_TW.itemClicked.connect(self.edgeSelected)
+		self.edges_TW.itemDoubleClicked.connect(self.editDistance)
 		#self.toolController_CB.currentIndexChanged.connect(self.updateTool)
+		self.edges_TW.itemChanged.connect(self.schedulePreview)
+		self.extendDist_LE.textChanged.connect(self.schedulePreview)
+		self.toolController_CB.currentIndexChanged.connect(self.schedulePreview)
 
 		if obj:
 			self.helperFace = obj
-			self.setFaceName(self.helperFace.BaseFace[0], self.helperFace.BaseFace[1][0])
+			self.setFaceName(self.helperFace.BaseFace[0], self.helperFace.BaseFace[1])
 			self.extendDist_LE.setText(str(obj.ExtraDist))
 			self.buildEdgeList()
 		else:
@@ -68,28 +122,48 @@ class PathHelperPanel:
 			self.extendDist_LE.setText(str(0.0))
 			self.handleSelection()
 
+		## only preview edits made after the panel is populated
+		self.previewReady = True
+
 	def setFaceName(self, baseModel, faceName):
 		objName = baseModel.Name
+		if not isinstance(faceName, str):
+			faceName = ','.join(faceName)
 		modelFaceName = objName + '.' + faceName 
 		self.face_LE.setText(modelFaceName)
 
 	def handleSelection(self):
-		sel = None
+		selections = []
 		try:	
-			sel = FreeCADGui.Selection.getSelectionEx()[0]
+			selEx = FreeCADGui.Selection.getSelectionEx()
 		except:
-			pass
-		if sel:
+			selEx = []
+
+		for sel in selEx:
 			for subName in sel.SubElementNames:
 				if 'Face' in subName:
-					self.setFaceName(sel.Object, subName)
-					self.helperFace = PathHelperFace.create((sel.Object, subName))
-					if self.helperFace is not None: 
-						self.buildEdgeList()
+					selections.append((sel.Object, subName))
 					
 				if 'Edge' in subName:
 					FreeCAD.Console.PrintError('Edge Selection Not Currently Supported')
 
+		if len(selections) == 1:
+			self.setFaceName(selections[0][0], selections[0][1])
+			self.helperFace = PathHelperFace.create(selections[0])
+		elif len(selections) > 1:
+			## create all the helper faces with a single recompute and edit the first one created
+			firstFace = None
+			for baseFace, obj, error in PathHelperFace.createMany(selections, merge=self.mergeFaces_CB.isChecked()):
+				if error:
+					FreeCAD.Console.PrintError('{}.{}: {}\n'.format(baseFace[0].Name, baseFace[1], error))
+				if obj is not None and firstFace is None:
+					self.setFaceName(baseFace[0], baseFace[1])
+					firstFace = obj
+			self.helperFace = firstFace
+
+		if self.helperFace is not None: 
+			self.buildEdgeList()
+
 	def buildEdgeList(self):
 		''' populate the ui tree with the edges that can be extended'''
 		self.edgeList = []
@@ -107,10 +181,16 @@ class PathHelperPanel:
 			self.edges_TW.expandItem(parentItem)
 
 			if not treeExists:
-				for edgeNum in self.helperFace.ExtendableEdges:
+				edgeDistances = self.helperFace.EdgeDistances
+				for idx, edgeNum in enumerate(self.helperFace.ExtendableEdges):
 					###### populate the edge tree ######
 					edgeItem =  QTreeWidgetItem()
 					edgeItem.setText(0, str("Edge" + str(edgeNum)))
+					edgeItem.setData(0, QtCore.Qt.UserRole, edgeNum)
+					## the distance column is editable, it is added to the extend distance of the edge
+					edgeDist = edgeDistances[idx] if idx < len(edgeDistances) else 0.0
+					edgeItem.setText(1, str(edgeDist))
+					edgeItem.setFlags(edgeItem.flags() | QtCore.Qt.ItemIsEditable)
 					checked = QtCore.Qt.Unchecked
 					if edgeNum in self.helperFace.CheckedEdges:
 						checked = QtCore.Qt.Checked
@@ -125,26 +205,120 @@ class PathHelperPanel:
 		FreeCADGui.Selection.clearSelection()
 		FreeCADGui.Selection.addSelection(self.helperFace, edgeName)
 	
-	def extendFace(self):
-
-		self.updateTool()
+	def editDistance(self, item, column):
+		'''edit the distance of the double clicked edge'''
+		if item.parent() is not None:
+			self.edges_TW.editItem(item, 1)
 
+	def getEdgeSettings(self):
+		''' return the checked edge numbers and the distance of every extendable edge from the tree '''
 		treeFace = self.edges_TW.topLevelItem(0)	
 		edgeCount = treeFace.childCount()
 		checkedEdges = []
+		edgeDistances = []
 		for i in range(edgeCount):
+			edgeNumber = int(treeFace.child(i).data(0, QtCore.Qt.UserRole))
 			if treeFace.child(i).checkState(0) == QtCore.Qt.CheckState.Checked:
-				edgeNumber = int(treeFace.child(i).text(0).replace('Edge', ''))
 				checkedEdges.append(edgeNumber)
+			try:
+				edgeDistances.append(FreeCAD.Units.Quantity(treeFace.child(i).text(1)).Value)
+			except ValueError:
+				FreeCAD.Console.PrintError('Invalid distance for Edge{}\n'.format(edgeNumber))
+				edgeDistances.append(0.0)
+		return checkedEdges, edgeDistances
+
+	def extendFace(self):
+
+		self.updateTool()
+		checkedEdges, edgeDistances = self.getEdgeSettings()
 				
 		self.helperFace.ExtraDist = FreeCAD.Units.Quantity(self.extendDist_LE.text()).Value
 		self.helperFace.CheckedEdges = checkedEdges
+		self.helperFace.EdgeDistances = edgeDistances
 		FreeCAD.ActiveDocument.recompute()
+
+	def schedulePreview(self, *args):
+		''' restart the preview timer, the preview is computed once the edits pause '''
+		if self.previewReady and self.helperFace is not None:
+			self.previewTimer.start()
+
+	def startPreview(self):
+		''' extend the cached boundary with the panel settings on a worker thread '''
+		if self.helperFace is None or self.edges_TW.topLevelItem(0) is None:
+			return
+
+		try:
+			extraDist = FreeCAD.Units.Quantity(self.extendDist_LE.text()).Value
+		except ValueError:
+			return
+
+		## only preview from the boundary of the last recompute, the document is not changed before accept
+		proxy = self.helperFace.Proxy
+		edges, extendableEdges = proxy.getCachedBoundary()
+		if edges is None:
+			return
+
+		checkedEdges, edgeDistances = self.getEdgeSettings()
+		extendDist = proxy.getExtendDist(self.getToolController(), extraDist)
+		distances = proxy.getEdgeDistances(extendDist, checkedEdges, extendableEdges, edgeDistances)
+
+		## results of older previews still running are ignored
+		self.previewGeneration += 1
+		## the worker gets its own copies, the cached edges are used by recomputes on the gui thread
+		job = PreviewJob(self.previewGeneration, [edge.copy() for edge in edges], checkedEdges, extendDist, distances)
+		job.signals.finished.connect(self.showPreview)
+		## keep a reference to the signals so they outlive the worker
+		self.previewSignals.append((self.previewGeneration, job.signals))
+		QtCore.QThreadPool.globalInstance().start(job)
+
+	def showPreview(self, generation, shape):
+		''' replace the preview overlay with the latest shape '''
+		self.previewSignals = [(gen, signals) for gen, signals in self.previewSignals if gen > generation]
+		if generation != self.previewGeneration or not self.previewReady:
+			return
+
+		self.removePreview()
+		if shape is None or shape.isNull():
+			return
+
+		points = []
+		lineCounts = []
+		for edge in shape.Edges:
+			edgePoints = edge.discretize(Deflection=0.01)
+			points.extend((p.x, p.y, p.z) for p in edgePoints)
+			lineCounts.append(len(edgePoints))
+
+		self.previewNode = coin.SoSeparator()
+		material = coin.SoMaterial()
+		material.diffuseColor = (1.0, 0.5, 0.0)
+		style = coin.SoDrawStyle()
+		style.lineWidth = 3
+		coords = coin.SoCoordinate3()
+		coords.point.setValues(0, len(points), points)
+		lines = coin.SoLineSet()
+		lines.numVertices.setValues(0, len(lineCounts), lineCounts)
+		for node in (material, style, coords, lines):
+			self.previewNode.addChild(node)
+		FreeCADGui.ActiveDocument.ActiveView.getSceneGraph().addChild(self.previewNode)
+
+	def removePreview(self):
+		''' remove the preview overlay from the scene, previews still running are discarded '''
+		self.previewGeneration += 1
+		if self.previewNode is not None:
+			FreeCADGui.ActiveDocument.ActiveView.getSceneGraph().removeChild(self.previewNode)
+			self.previewNode = None
+
+	def stopPreview(self):
+		''' stop further previews and remove the overlay '''
+		self.previewReady = False
+		self.previewTimer.stop()
+		self.removePreview()
 		
 	def loadTools(self):
-		job = PathUtils.findParentJob(self.helperFace.BaseFace[0])
+		context = PathHelperFace.getJobContext(self.helperFace.Document)
+		job = context.getJob(self.helperFace.BaseFace[0])
 		self.toolController_CB.addItem('None')
-		for idx, tc in enumerate(job.Tools.Group):					
+		for idx, tc in enumerate(context.getToolControllers(job)):					
 			self.toolController_CB.addItem(tc.Label)
 			
 			if self.helperFace.ToolController:
@@ -152,9 +326,10 @@ class PathHelperPanel:
 					self.toolController_CB.setCurrentIndex(idx + 1)
 
 	def getToolController(self):
-		job = PathUtils.findParentJob(self.helperFace.BaseFace[0])
+		context = PathHelperFace.getJobContext(self.helperFace.Document)
+		job = context.getJob(self.helperFace.BaseFace[0])
 		tcStr = self.toolController_CB.currentText()
-		for tc in job.Tools.Group:
+		for tc in context.getToolControllers(job):
 			if tc.Label == tcStr:
 				return tc
 		
@@ -165,17 +340,23 @@ class PathHelperPanel:
 		self.helperFace.ToolController = tc
 		
 	def reject(self):
+		self.stopPreview()
 		if self.tempObj:
 			FreeCAD.ActiveDocument.removeObject(self.tempObj) 
 		self.quit()
 
 	def accept(self):
 		FreeCAD.Console.PrintMessage("\nAccept Signal")
+		## the previewed settings are only written to the document on accept
+		self.stopPreview()
+		if self.helperFace is not None:
+			self.extendFace()
 		self.quit()
 
 	def clicked(self, button):
 		if button == QtGui.QDialogButtonBox.Apply:
 			FreeCAD.Console.PrintMessage("\nApply Signal")
+			self.removePreview()
 			self.extendFace()
 
 	def quit(self):
@@ -190,4 +371,34 @@ def Show():
 
     if FreeCADGui.Control.activeDialog():
 	    FreeCAD.Console.PrintMessage("Dialog Panel currently open: Close it?")
-    FreeCADGui.Control.showDialog(panel)
\ No newline at end of file
+    FreeCADGui.Control.showDialog(panel)
+
+def getSelectedJob():
+    """Return the selected job, the job of the selected object or the only job of the active document."""
+    import PathScripts.PathUtils as PathUtils
+    jobs = PathUtils.GetJobs()
+    for sel in FreeCADGui.Selection.getSelection():
+        if sel in jobs:
+            return sel
+        job = PathUtils.findParentJob(sel)
+        if job is not None:
+            return job
+
+    if len(jobs) == 1:
+        return jobs[0]
+    return None
+
+def createJobFaces():
+    """Create helper faces for all the open horizontal faces of the models of a job."""
+    job = getSelectedJob()
+    if job is None:
+        FreeCAD.Console.PrintError('Select a job or an object within a job\n')
+        return
+
+    created = 0
+    for baseFace, obj, error in PathHelperFace.createForJob(job):
+        if error:
+            FreeCAD.Console.PrintError('{}.{}: {}\n'.format(baseFace[0].Name, baseFace[1], error))
+        else:
+            created += 1
+    FreeCAD.Console.PrintMessage('Created {} helper faces for {}\n'.format(created, job.Label))
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+# ***************************************************************************
+# *                                                                         *
+# *   Copyright (c) 2020 Daniel Wood <s.d.wood.82@googlemail.com>            *
+# *                                                                         *
+# *   This program is free software; you can redistribute it and/or modify  *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)    *
+# *   as published by the Free Software Foundation; either version 2 of     *
+# *   the License, or (at your option) any later version.                   *
+# *   for detail see the LICENCE text file.                                 *
+# *                                                                         *
+# *   This program is distributed in the hope that it will be useful,       *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+# *   GNU Library General Public License for more details.                  *
+# *                                                                         *
+# *   You should have received a copy of the GNU Library General Public     *
+# *   License along with this program; if not, write to the Free Software   *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+# *   USA                                                                   *
+# *                                                                         *
+# ***************************************************************************
+
+
+"""Benchmarks for the helper face geometry engine using synthetic models.
+
+Run with FreeCADCmd or a python interpreter that can import FreeCAD:
+
+    python3 benchmarks/benchmarkHelperFace.py --output results.json
+
+The results file records per stage timings and OCC call counts for every case so runs
+from different commits can be compared.
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+
+__dir__ = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(__dir__))
+
+import FreeCAD
+import Part
+
+import PathHelperFaceCore
+
+def makeBlock():
+	return Part.makeBox(100, 100, 20)
+
+def makePolygonPocket(sides):
+	''' block with a pocket open on the front face, the pocket wall is a polygon with the given number of sides '''
+	points = [FreeCAD.Vector(80, -10, 10)]
+	for i in range(sides + 1):
+		angle = math.pi * i / sides
+		points.append(FreeCAD.Vector(50 + 30 * math.cos(angle), 30 * math.sin(angle), 10))
+	points.append(FreeCAD.Vector(20, -10, 10))
+	points.append(FreeCAD.Vector(80, -10, 10))
+
+	pocket = Part.Face(Part.makePolygon(points)).extrude(FreeCAD.Vector(0, 0, 11))
+	return makeBlock().cut(pocket)
+
+def makeArcPocket():
+	''' block with a half round pocket open on the front face '''
+	pocket = Part.makeCylinder(30, 11, FreeCAD.Vector(50, 0, 10))
+	return makeBlock().cut(pocket)
+
+def findFace(shape, z):
+	''' return the name of the horizontal face at the z height '''
+	for i, face in enumerate(shape.Faces):
+		bb = face.BoundBox
+		if abs(bb.ZMin - z) < 1e-6 and abs(bb.ZMax - z) < 1e-6:
+			return 'Face{}'.format(i + 1)
+	return None
+
+def getCases(sizes):
+	''' return a list of (case name, shape, face name) '''
+	cases = []
+	block = makeBlock()
+	cases.append(('topFace', block, findFace(block, 20)))
+	arcPocket = makeArcPocket()
+	cases.append(('arcPocket', arcPocket, findFace(arcPocket, 10)))
+	for sides in sizes:
+		pocket = makePolygonPocket(sides)
+		cases.append(('openPocket{}'.format(sides), pocket, findFace(pocket, 10)))
+	return cases
+
+def runCase(shape, faceName, stockBounds):
+	''' run the helper face pipeline once, returning the stage timings and OCC call counts '''
+	PathHelperFaceCore.insideCache.clear()
+	profiler = PathHelperFaceCore.profiler
+	profiler.reset()
+	profiler.enabled = True
+	edgeManager = PathHelperFaceCore.HelperEdgeManager()
+
+	try:
+		with profiler.stage('getEdges'):
+			helperEdges = edgeManager.getShapeEdges(shape, faceName, stockBounds)
+			extendableEdges = [idx + 1 for idx, helperEdge in enumerate(helperEdges) if helperEdge._isExtendable()]
+			edges = [helperEdge._getEdge() for helperEdge in helperEdges]
+
+		with profiler.stage('buildFace'):
+			edgeManager.buildFace(list(edges), extendableEdges, 3.0)
+	finally:
+		profiler.enabled = False
+
+	report = profiler.report()
+	return len(edges), report['timings'], report['counts']
+
+def getCommit():
+	try:
+		return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=__dir__, stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Benchmark the helper face geometry engine')
+	parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000], help='number of wall segments for the open pocket cases')
+	parser.add_argument('--repeat', type=int, default=5, help='number of runs per case, the median time is reported')
+	parser.add_argument('--output', help='path of the JSON results file')
+	args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+	results = {'commit': getCommit(), 'freecad': FreeCAD.Version()[:3], 'cases': []}
+	for name, shape, faceName in getCases(args.sizes):
+		bb = FreeCAD.BoundBox(shape.BoundBox)
+		bb.enlarge(5)
+
+		runs = [runCase(shape, faceName, bb) for i in range(args.repeat)]
+		edgeCount, timings, calls = runs[-1]
+		stages = {stage: statistics.median(run[1].get(stage, 0) for run in runs) for stage in timings}
+		results['cases'].append({'name': name, 'edges': edgeCount, 'stages': stages, 'calls': calls})
+
+		print('{:<18} {:>6} edges  '.format(name, edgeCount) + '  '.join('{} {:.2f} ms'.format(stage, t * 1000) for stage, t in stages.items()))
+
+	if args.output:
+		with open(args.output, 'w') as f:
+			json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+	main()